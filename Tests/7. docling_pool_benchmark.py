@@ -0,0 +1,61 @@
+import os
+import statistics
+import sys
+import time
+from io import BytesIO
+from dotenv import load_dotenv
+from docling.datamodel.base_models import DocumentStream
+from docling.document_converter import DocumentConverter
+from docling_core.transforms.chunker import HierarchicalChunker
+
+# Make the Airflow DAGs' shared modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "airflow_docker_pipelines", "dags"))
+from common.docling_pool import DoclingConverterPool
+
+# Load environment variables
+load_dotenv()
+
+# Function to convert a PDF the way the pipeline used to: a new converter for every document
+def convert_cold(name, pdf_content):
+    start = time.perf_counter()
+    converter = DocumentConverter()
+    result = converter.convert(DocumentStream(name=name, stream=BytesIO(pdf_content)))
+    [chunk.text for chunk in HierarchicalChunker().chunk(result.document)]
+    result.document.export_to_markdown()
+    return time.perf_counter() - start
+
+# Function to convert every PDF through a warm pool, returning per-document times
+def convert_warm(pdfs, workers):
+    with DoclingConverterPool(workers) as pool:
+        start = time.perf_counter()
+        pool.warm_up()
+        print(f"Pool of {pool.workers} worker(s) ready in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        futures = [pool.submit(name, content) for name, content in pdfs]
+        results = [future.result() for future in futures]
+        return [result["seconds"] for result in results], time.perf_counter() - start
+
+def summarize(label, times, wall):
+    print(f"{label}: {len(times)} documents, mean {statistics.mean(times):.2f}s, "
+          f"median {statistics.median(times):.2f}s, max {max(times):.2f}s, wall {wall:.1f}s")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python '7. docling_pool_benchmark.py' <pdf> [<pdf> ...]")
+        sys.exit(1)
+
+    workers = int(os.getenv("DOCLING_WORKERS", "2"))
+    pdfs = []
+    for path in sys.argv[1:]:
+        with open(path, "rb") as file:
+            pdfs.append((os.path.basename(path), file.read()))
+
+    print("Converting with a new DocumentConverter per document (cold)...")
+    start = time.perf_counter()
+    cold_times = [convert_cold(name, content) for name, content in pdfs]
+    summarize("Cold", cold_times, time.perf_counter() - start)
+
+    print(f"Converting through DoclingConverterPool with {workers} worker(s) (warm)...")
+    warm_times, wall = convert_warm(pdfs, workers)
+    summarize("Warm", warm_times, wall)
+    print(f"Per-document speedup: {statistics.mean(cold_times) / statistics.mean(warm_times):.1f}x")
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+
+# Make the Airflow DAGs' shared modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "airflow_docker_pipelines", "dags"))
+from common.cfa_scraper import CFAScraper, LISTING_URL, RESULTS_PER_PAGE, extract_pdf_link, init_driver, parse_listing
+
+# Load environment variables
+load_dotenv()
+
+# Titles the DAG filters for
+target_titles = {
+    'Overcoming the Notion of a Single Reference Currency: A Currency Basket Approach',
+    'Risk Profiling through a Behavioral Finance Lens',
+    'The Evolution of Asset/Liability Management'
+}
+
+# Function reproducing the original DAG's scrape: one browser, fixed sleeps, serial detail pages
+def scrape_serial(pages):
+    driver = init_driver()
+    results = []
+    try:
+        for first in range(0, pages * RESULTS_PER_PAGE, RESULTS_PER_PAGE):
+            driver.get(LISTING_URL.format(first=first))
+            time.sleep(10)
+            for pub in parse_listing(driver.page_source):
+                if pub['title'] not in target_titles:
+                    continue
+                pdf_link = None
+                if pub['href']:
+                    driver.get(pub['href'])
+                    time.sleep(5)
+                    pdf_link = extract_pdf_link(BeautifulSoup(driver.page_source, 'html.parser'))
+                results.append({**pub, 'pdf_link': pdf_link})
+    finally:
+        driver.quit()
+    return results
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    print(f"Scraping {pages} listing pages serially with fixed sleeps...")
+    start = time.perf_counter()
+    serial = scrape_serial(pages)
+    serial_time = time.perf_counter() - start
+    print(f"Serial: {len(serial)} publications in {serial_time:.1f}s")
+
+    print(f"Scraping {pages} listing pages with CFAScraper...")
+    start = time.perf_counter()
+    scraper = CFAScraper()
+    concurrent = scraper.scrape(pages=pages, target_titles=target_titles)
+    concurrent_time = time.perf_counter() - start
+    print(f"Concurrent: {len(concurrent)} publications in {concurrent_time:.1f}s ({scraper.stats})")
+
+    same = [(p['title'], p['pdf_link']) for p in serial] == [(p['title'], p['pdf_link']) for p in concurrent]
+    print(f"Speedup: {serial_time / concurrent_time:.1f}x; results {'match' if same else 'differ'}")
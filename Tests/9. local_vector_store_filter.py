@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+# Make the Airflow DAGs' shared modules importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "airflow_docker_pipelines", "dags"))
+from common import local_vector_store
+from common.local_vector_store import LocalVectorStore
+
+PUBLICATIONS = 40
+CHUNKS_PER_PUBLICATION = 100
+DIMENSION = 64
+K = 5
+
+# Regression check: a publication-scoped query must return k chunks of that publication
+# even when the store has an IVF index, as Pinecone applies the filter before the search.
+def test_filtered_query_with_ivf():
+    local_vector_store.IVF_MIN_VECTORS = PUBLICATIONS * CHUNKS_PER_PUBLICATION // 2
+    rng = np.random.default_rng(0)
+    # Chunks of one publication cluster together, so they fall into a few IVF lists
+    centers = rng.normal(size=(PUBLICATIONS, DIMENSION))
+    embeddings = (np.repeat(centers, CHUNKS_PER_PUBLICATION, axis=0)
+                  + 0.3 * rng.normal(size=(PUBLICATIONS * CHUNKS_PER_PUBLICATION, DIMENSION))).astype(np.float32)
+    ids = [f"pub{i // CHUNKS_PER_PUBLICATION}_chunk{i % CHUNKS_PER_PUBLICATION}" for i in range(len(embeddings))]
+    metadatas = [{"publication_id": f"pub{i // CHUNKS_PER_PUBLICATION}"} for i in range(len(embeddings))]
+
+    with tempfile.TemporaryDirectory() as path:
+        store = LocalVectorStore(path)
+        store.add_texts(ids, metadatas=metadatas, ids=ids, embeddings=embeddings.tolist())
+        store.build_index()
+        assert store._ivf is not None # pylint: disable=protected-access
+
+        short = 0
+        for publication in range(1, PUBLICATIONS):
+            query = rng.normal(size=DIMENSION).tolist()
+            publication_id = f"pub{publication}"
+            results = store.similarity_search_by_vector_with_score(
+                query, k=K, filter={"publication_id": {"$eq": publication_id}}
+            )
+            assert all(document.metadata["publication_id"] == publication_id for document, _ in results)
+            short += len(results) < K
+        print(f"Filtered queries returning fewer than {K} results: {short} of {PUBLICATIONS - 1}")
+        assert short == 0
+
+        # Unfiltered queries still go through the IVF lists
+        results = store.similarity_search_by_vector_with_score(embeddings[123].tolist(), k=K)
+        assert results[0][0].id == ids[123]
+
+if __name__ == "__main__":
+    test_filtered_query_with_ivf()
+    print("OK")
@@ -0,0 +1,276 @@
+#cfa_scraper.py
+"""
+This module scrapes the CFA Institute Research Foundation publication listing.
+
+Listing pages are rendered client-side by Coveo, so they are loaded by a pool of
+headless Chrome workers that wait for the results to render instead of sleeping
+for a fixed time. Detail pages are server-rendered and are fetched over plain
+HTTP with a politeness limit, falling back to a browser worker only when the PDF
+link cannot be found in the static HTML.
+
+Given the publications already known from a previous run, paging stops at the
+first listing page made up entirely of known publications, and their detail
+pages are requested conditionally so unchanged pages return 304 Not Modified.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import requests
+from bs4 import BeautifulSoup
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+BASE_URL = "https://rpc.cfainstitute.org"
+LISTING_URL = f"{BASE_URL}/en/research-foundation/publications#first={{first}}&sort=%40officialz32xdate%20descending"
+RESULTS_PER_PAGE = 10
+
+SCRAPER_BROWSERS = int(os.getenv("SCRAPER_BROWSERS", "3"))
+SCRAPER_PAGE_TIMEOUT = float(os.getenv("SCRAPER_PAGE_TIMEOUT", "30"))
+# Politeness limit for detail pages: concurrent requests and minimum spacing between them
+SCRAPER_DETAIL_CONCURRENCY = int(os.getenv("SCRAPER_DETAIL_CONCURRENCY", "4"))
+SCRAPER_MIN_INTERVAL = float(os.getenv("SCRAPER_MIN_INTERVAL", "0.25"))
+
+RESULT_SELECTOR = "div.coveo-list-layout.CoveoResult"
+NO_RESULTS_SELECTOR = ".coveo-query-summary-no-results-string"
+PDF_LINK_SELECTOR = "a.content-asset--primary, a.items__item"
+
+def init_driver():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    # Return from driver.get once the DOM is ready; the explicit waits cover the rest
+    chrome_options.page_load_strategy = "eager"
+
+    service = Service("/usr/local/bin/chromedriver")
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    return driver
+
+def absolute_url(url: Optional[str]) -> Optional[str]:
+    return f"{BASE_URL}{url}" if url and url.startswith('/') else url
+
+def extract_pdf_link(pdf_soup):
+    primary_link = pdf_soup.find('a', class_='content-asset--primary', href=True)
+    if primary_link and '.pdf' in primary_link['href']:
+        return primary_link['href'] if primary_link['href'].startswith('http') else f"{BASE_URL}{primary_link['href']}"
+
+    secondary_pdf_tag = pdf_soup.find('a', class_='items__item', href=True)
+    if secondary_pdf_tag and '.pdf' in secondary_pdf_tag['href']:
+        return secondary_pdf_tag['href'] if secondary_pdf_tag['href'].startswith('http') else f"{BASE_URL}{secondary_pdf_tag['href']}"
+
+    return None
+
+def parse_listing(page_source: str) -> List[Dict[str, Optional[str]]]:
+    """
+    Parse the publications on a rendered listing page.
+    """
+    soup = BeautifulSoup(page_source, 'html.parser')
+    publications = []
+    for pub in soup.find_all('div', class_='coveo-list-layout CoveoResult'):
+        title_tag = pub.find('a', class_='CoveoResultLink')
+        image_tag = pub.find('img', class_='coveo-result-image')
+        summary_tag = pub.find('div', class_='result-body')
+        date_tag = pub.find('span', class_='date')
+        authors_tag = pub.find('span', class_='author')
+        publications.append({
+            'title': title_tag.text.strip() if title_tag else None,
+            'href': absolute_url(title_tag['href']) if title_tag and title_tag.has_attr('href') else None,
+            'image_url': absolute_url(image_tag['src']) if image_tag and image_tag.has_attr('src') else None,
+            'summary': summary_tag.text.strip() if summary_tag else None,
+            'date': date_tag.text.strip() if date_tag else None,
+            'authors': authors_tag.text.strip() if authors_tag else None,
+        })
+    return publications
+
+class BrowserPool:
+    """
+    A fixed set of headless Chrome workers, each used by one thread at a time.
+    """
+
+    def __init__(self, size: int = SCRAPER_BROWSERS):
+        self.size = size
+        self._drivers: "queue.Queue" = queue.Queue()
+        self._all = []
+        # Browsers start in parallel; each launch takes a second or two
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            for driver in executor.map(lambda _: init_driver(), range(size)):
+                self._all.append(driver)
+                self._drivers.put(driver)
+
+    @contextmanager
+    def driver(self) -> Iterator[webdriver.Chrome]:
+        driver = self._drivers.get()
+        try:
+            yield driver
+        finally:
+            self._drivers.put(driver)
+
+    def close(self):
+        for driver in self._all:
+            try:
+                driver.quit()
+            except Exception as e: # pylint: disable=broad-except
+                print(f"Error closing browser: {e}")
+        self._all = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PolitenessLimiter:
+    """
+    Bounds concurrent requests to a site and spaces their start times.
+    """
+
+    def __init__(self, max_concurrency: int = SCRAPER_DETAIL_CONCURRENCY, min_interval: float = SCRAPER_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    @contextmanager
+    def slot(self):
+        with self._semaphore:
+            with self._lock:
+                delay = self._next_start - time.monotonic()
+                self._next_start = max(self._next_start, time.monotonic()) + self.min_interval
+            if delay > 0:
+                time.sleep(delay)
+            yield
+
+def load_listing_page(driver, first: int) -> List[Dict[str, Optional[str]]]:
+    """
+    Load one listing page and wait until Coveo has rendered its results.
+    """
+    # Paging only changes the URL fragment, so results from a previous page must go stale first
+    previous = driver.find_elements(By.CSS_SELECTOR, RESULT_SELECTOR)
+    driver.get(LISTING_URL.format(first=first))
+    wait = WebDriverWait(driver, SCRAPER_PAGE_TIMEOUT)
+    if previous:
+        wait.until(EC.staleness_of(previous[0]))
+    wait.until(EC.any_of(
+        EC.presence_of_element_located((By.CSS_SELECTOR, RESULT_SELECTOR)),
+        EC.presence_of_element_located((By.CSS_SELECTOR, NO_RESULTS_SELECTOR))
+    ))
+    return parse_listing(driver.page_source)
+
+class CFAScraper:
+    """
+    Scrapes listing pages with a browser pool and detail pages over HTTP.
+    """
+
+    def __init__(self, browsers: int = SCRAPER_BROWSERS, limiter: Optional[PolitenessLimiter] = None):
+        self.browsers = browsers
+        self.limiter = limiter or PolitenessLimiter()
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "Mozilla/5.0 (compatible; research-publications-scraper)"
+        self.stats = {"listing_pages": 0, "detail_http": 0, "detail_not_modified": 0, "detail_browser": 0}
+        self.seen: List[Dict[str, Optional[str]]] = []
+        self._stats_lock = threading.Lock()
+        self._pool: Optional[BrowserPool] = None
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _listing_page(self, first: int) -> List[Dict[str, Optional[str]]]:
+        with self._pool.driver() as driver, self.limiter.slot():
+            publications = load_listing_page(driver, first)
+        self._count("listing_pages")
+        print(f"Loaded listing page {first // RESULTS_PER_PAGE + 1} ({len(publications)} publications)")
+        return publications
+
+    def _pdf_link(self, href: str, known: Optional[dict] = None) -> Dict[str, Optional[str]]:
+        known = known or {}
+        headers = {}
+        if known.get("pdf_link") and known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("pdf_link") and known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
+        with self.limiter.slot():
+            response = self.session.get(href, headers=headers, timeout=SCRAPER_PAGE_TIMEOUT)
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        if response.status_code == 304:
+            self._count("detail_not_modified")
+            return {"pdf_link": known["pdf_link"], "etag": known.get("etag"), "last_modified": known.get("last_modified")}
+        if response.status_code == 200:
+            pdf_link = extract_pdf_link(BeautifulSoup(response.text, 'html.parser'))
+            if pdf_link:
+                self._count("detail_http")
+                return {"pdf_link": pdf_link, **validators}
+
+        # Fall back to rendering the page, waiting for the download links to appear
+        with self._pool.driver() as driver, self.limiter.slot():
+            driver.get(href)
+            try:
+                WebDriverWait(driver, SCRAPER_PAGE_TIMEOUT).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, PDF_LINK_SELECTOR))
+                )
+            except TimeoutException:
+                print(f"No PDF link rendered on {href}")
+            page_source = driver.page_source
+        self._count("detail_browser")
+        return {"pdf_link": extract_pdf_link(BeautifulSoup(page_source, 'html.parser')), **validators}
+
+    def _with_pdf_link(self, publication: Dict[str, Optional[str]], known: Optional[dict] = None) -> Dict[str, Optional[str]]:
+        print(f"Scraping publication: {publication['title']}")
+        if not publication['href']:
+            return {**publication, 'pdf_link': None, 'etag': None, 'last_modified': None}
+        return {**publication, **self._pdf_link(publication['href'], known)}
+
+    @staticmethod
+    def _is_settled(publication: Dict[str, Optional[str]], known: Dict[str, dict]) -> bool:
+        """Known from a previous run and not flagged for retry."""
+        entry = known.get(publication['href'])
+        return entry is not None and not entry.get('retry')
+
+    def scrape(self, pages: int = 10, target_titles: Optional[set] = None,
+               known: Optional[Dict[str, dict]] = None) -> List[Dict[str, Optional[str]]]:
+        """
+        Scrape listing pages concurrently, then the matching detail pages, preserving listing order.
+        known maps detail page URLs from a previous run to their state; paging stops at the
+        first page whose publications are all known and none is flagged for retry. Every listed publication is kept in self.seen.
+        """
+        known = known or {}
+        listings = []
+        with BrowserPool(self.browsers) as pool:
+            self._pool = pool
+            try:
+                # Listing pages load in waves of one page per browser so paging can stop early
+                with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                    for wave in range(0, pages, pool.size):
+                        firsts = [page * RESULTS_PER_PAGE for page in range(wave, min(wave + pool.size, pages))]
+                        for listing in executor.map(self._listing_page, firsts):
+                            listings.append(listing)
+                            if known and listing and all(self._is_settled(pub, known) for pub in listing):
+                                break
+                        else:
+                            continue
+                        print(f"Reached already known publications after {len(listings)} pages; stopping.")
+                        break
+                self.seen = [publication for listing in listings for publication in listing]
+                publications = [
+                    publication for publication in self.seen
+                    if target_titles is None or publication['title'] in target_titles
+                ]
+                with ThreadPoolExecutor(max_workers=SCRAPER_DETAIL_CONCURRENCY) as executor:
+                    return list(executor.map(
+                        lambda publication: self._with_pdf_link(publication, known.get(publication['href'])),
+                        publications
+                    ))
+            finally:
+                self._pool = None
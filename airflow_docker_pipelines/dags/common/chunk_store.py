@@ -0,0 +1,91 @@
+#chunk_store.py
+"""
+This module stores document chunks as Parquet artifacts so that only a small
+reference travels through XCom instead of the chunk text itself.
+
+Artifacts go under CHUNK_ARTIFACT_URI, which can be an s3://bucket/prefix URI
+or a local directory shared by the workers. Readers stream record batches, so
+indexing a large document never holds all of its chunks in memory.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CHUNK_ARTIFACT_URI = os.getenv("CHUNK_ARTIFACT_URI", "")
+CHUNK_ROW_GROUP_SIZE = int(os.getenv("CHUNK_ROW_GROUP_SIZE", "256"))
+
+CHUNK_SCHEMA = pa.schema([("chunk_id", pa.string()), ("text", pa.large_string())])
+
+_s3 = None
+
+def _s3_client():
+    global _s3
+    if _s3 is None:
+        _s3 = boto3.client(
+            's3',
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+            region_name=os.getenv("AWS_REGION")
+        )
+    return _s3
+
+def artifact_uri(root: str, name: str) -> str:
+    """
+    Build the URI of an artifact under an s3:// or local root.
+    """
+    return f"{root.rstrip('/')}/{name}"
+
+def write_chunks(uri: str, chunk_ids: List[str], texts: List[str]) -> dict:
+    """
+    Write chunks to a Parquet artifact and return the reference to pass through XCom.
+    """
+    table = pa.Table.from_arrays([pa.array(chunk_ids, pa.string()), pa.array(texts, pa.large_string())],
+                                 schema=CHUNK_SCHEMA)
+    parsed = urlparse(uri)
+    if parsed.scheme == "s3":
+        with tempfile.NamedTemporaryFile(suffix=".parquet") as tmp:
+            pq.write_table(table, tmp.name, row_group_size=CHUNK_ROW_GROUP_SIZE, compression="zstd")
+            _s3_client().upload_file(tmp.name, parsed.netloc, parsed.path.lstrip('/'))
+    else:
+        os.makedirs(os.path.dirname(uri) or ".", exist_ok=True)
+        tmp_path = f"{uri}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path, row_group_size=CHUNK_ROW_GROUP_SIZE, compression="zstd")
+        os.replace(tmp_path, uri)
+    return {"uri": uri, "num_chunks": table.num_rows}
+
+@contextmanager
+def _local_copy(uri: str) -> Iterator[str]:
+    """Yield a local path for the artifact, downloading S3 artifacts to a temporary file."""
+    parsed = urlparse(uri)
+    if parsed.scheme != "s3":
+        yield uri
+        return
+    with tempfile.NamedTemporaryFile(suffix=".parquet") as tmp:
+        _s3_client().download_file(parsed.netloc, parsed.path.lstrip('/'), tmp.name)
+        yield tmp.name
+
+def iter_chunk_batches(uri: str, batch_size: int, columns: Optional[List[str]] = None) -> Iterator[List[Tuple]]:
+    """
+    Stream an artifact as lists of (chunk_id, text) tuples, or of the requested columns.
+    """
+    columns = columns or ["chunk_id", "text"]
+    with _local_copy(uri) as path:
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield list(zip(*(batch.column(name).to_pylist() for name in columns)))
+
+def delete_artifact(uri: str):
+    """
+    Remove an artifact once it has been consumed.
+    """
+    parsed = urlparse(uri)
+    if parsed.scheme == "s3":
+        _s3_client().delete_object(Bucket=parsed.netloc, Key=parsed.path.lstrip('/'))
+    elif os.path.exists(uri):
+        os.remove(uri)
@@ -0,0 +1,122 @@
+#docling_pool.py
+"""
+This module keeps Docling converters warm so layout and OCR models are loaded
+once per worker rather than once per PDF.
+
+DoclingConverterPool starts DOCLING_WORKERS processes that each build a
+DocumentConverter and HierarchicalChunker at startup and then convert PDFs
+submitted to the pool's queue. Where child processes are not allowed (for
+example inside a daemonic Celery worker) or DOCLING_WORKERS is 1, the pool
+converts in-process with a single warm converter instead.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from typing import Optional
+
+DOCLING_WORKERS = int(os.getenv("DOCLING_WORKERS", "2"))
+
+# Per-process converter state, set by _init_worker
+_converter = None
+_chunker = None
+_converted = 0
+
+def _init_worker():
+    """Load Docling models once for this process."""
+    global _converter, _chunker
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter
+    from docling_core.transforms.chunker import HierarchicalChunker
+
+    _converter = DocumentConverter()
+    # Build the PDF pipeline now so model loading is not charged to the first document
+    if hasattr(_converter, "initialize_pipeline"):
+        _converter.initialize_pipeline(InputFormat.PDF)
+    _chunker = HierarchicalChunker()
+
+def _ready(_) -> int:
+    return os.getpid()
+
+def _convert(name: str, pdf_content: bytes) -> dict:
+    """Convert one PDF to Markdown and chunk texts with this process's warm converter."""
+    global _converted
+    from docling.datamodel.base_models import DocumentStream
+
+    start = time.perf_counter()
+    result = _converter.convert(DocumentStream(name=name, stream=BytesIO(pdf_content)))
+    chunks = [chunk.text for chunk in _chunker.chunk(result.document)]
+    warm = _converted > 0
+    _converted += 1
+    return {
+        "markdown": result.document.export_to_markdown(),
+        "chunks": chunks,
+        "seconds": time.perf_counter() - start,
+        "warm": warm,
+        "pid": os.getpid()
+    }
+
+class DoclingConverterPool:
+    """
+    A pool of processes with warm Docling converters.
+    """
+
+    def __init__(self, workers: int = DOCLING_WORKERS):
+        self.in_process = workers <= 1 or multiprocessing.current_process().daemon
+        self.workers = 1 if self.in_process else workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        if self.in_process:
+            _init_worker()
+        else:
+            # Spawned workers do not inherit the parent's threads or open connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+
+    def warm_up(self):
+        """
+        Start every worker and wait until each has loaded its models.
+        """
+        if self._executor is not None:
+            list(self._executor.map(_ready, range(self.workers)))
+
+    def submit(self, name: str, pdf_content: bytes) -> Future:
+        """
+        Queue a PDF for conversion, returning a future of its Markdown and chunk texts.
+        """
+        if self._executor is not None:
+            return self._executor.submit(_convert, name, pdf_content)
+        future = Future()
+        # The in-process converter is not thread-safe, so conversions run one at a time
+        with self._lock:
+            try:
+                future.set_result(_convert(name, pdf_content))
+            except Exception as e: # pylint: disable=broad-except
+                future.set_exception(e)
+        return future
+
+    def convert(self, name: str, pdf_content: bytes) -> dict:
+        """
+        Convert a PDF and wait for the result.
+        """
+        return self.submit(name, pdf_content).result()
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,176 @@
+#embedding_cache.py (mirrors backend/research_canvas/embedding_cache.py)
+"""
+This module caches embeddings keyed on model, input type and normalized text.
+
+Vectors are held as float32 arrays in an LRU tier and, when EMBEDDING_CACHE_PATH
+is set, in a SQLite file that the backend and the ingestion DAG can share.
+Query and passage embeddings are cached separately because the NVIDIA
+retrieval models embed them differently.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse whitespace so trivially different inputs share an entry.
+    """
+    return " ".join(text.split())
+
+class EmbeddingCache:
+    """
+    An LRU cache of float32 embeddings with an optional SQLite tier.
+    """
+
+    def __init__(self, maxsize: int = 50000, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0}
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def key(model: str, input_type: str, text: str) -> str:
+        """
+        Build the cache key for an already normalized text.
+        """
+        return hashlib.sha256(f"{model}\0{input_type}\0{text}".encode("utf-8")).hexdigest()
+
+    def _store(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up several keys, returning None for each miss.
+        """
+        found: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[i] = vector
+                else:
+                    missing.append(i)
+
+        if missing and self.path:
+            with self._connect() as conn:
+                for i in missing:
+                    row = conn.execute("SELECT vector FROM embeddings WHERE key = ?", (keys[i],)).fetchone()
+                    if row:
+                        found[i] = np.frombuffer(row[0], dtype=np.float32)
+            with self._lock:
+                for i in missing:
+                    if found[i] is not None:
+                        self._store(keys[i], found[i])
+                        self.stats["disk_hits"] += 1
+
+        with self._lock:
+            misses = sum(vector is None for vector in found)
+            self.stats["misses"] += misses
+            self.stats["hits"] += len(keys) - misses
+        return found
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        """
+        Store several embeddings.
+        """
+        arrays = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+        with self._lock:
+            for key, array in zip(keys, arrays):
+                self._store(key, array)
+        if self.path:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array.tobytes()) for key, array in zip(keys, arrays)]
+                )
+
+    def info(self) -> dict:
+        """
+        Return cache counters and current size.
+        """
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so identical text is only embedded once.
+    """
+
+    def __init__(self, client: Embeddings, cache: EmbeddingCache, model: Optional[str] = None):
+        self.client = client
+        self.cache = cache
+        self.model = model or getattr(client, "model", client.__class__.__name__)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [normalize_text(text) for text in texts]
+        keys = [EmbeddingCache.key(self.model, "passage", text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Embed each distinct missing text once
+            unique = list(OrderedDict.fromkeys(texts[i] for i in missing))
+            embedded = self.client.embed_documents(unique)
+            self.cache.put_many([EmbeddingCache.key(self.model, "passage", text) for text in unique], embedded)
+            by_text = dict(zip(unique, embedded))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        text = normalize_text(text)
+        key = EmbeddingCache.key(self.model, "query", text)
+        vector = self.cache.get_many([key])[0]
+        if vector is None:
+            vector = self.client.embed_query(text)
+            self.cache.put_many([key], [vector])
+        return np.asarray(vector, dtype=np.float32).tolist()
+
+    async def _acache(self, method, *args):
+        """Run a cache call, moving it off the event loop when it may touch SQLite."""
+        if self.cache.path:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        text = normalize_text(text)
+        key = EmbeddingCache.key(self.model, "query", text)
+        vector = (await self._acache(self.cache.get_many, [key]))[0]
+        if vector is None:
+            vector = await self.client.aembed_query(text)
+            await self._acache(self.cache.put_many, [key], [vector])
+        return np.asarray(vector, dtype=np.float32).tolist()
+
+embedding_cache = EmbeddingCache(
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "50000")),
+    path=os.getenv("EMBEDDING_CACHE_PATH") or None
+)
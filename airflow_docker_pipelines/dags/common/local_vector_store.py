@@ -0,0 +1,423 @@
+#local_vector_store.py (mirrors backend/research_canvas/local_vector_store.py)
+"""
+This module provides an in-process vector store used in place of Pinecone for
+development, CI and air-gapped deployments (VECTOR_STORE_BACKEND=local).
+
+Vectors are kept L2-normalized in an append-only float32 file that is
+memory-mapped for reads, so a top-k cosine query is a single matrix-vector
+product. Corpora above LOCAL_IVF_MIN_VECTORS also get an IVF index (spherical
+k-means lists), built lazily at query time, so only the closest lists are scanned.
+Filtered queries are masked first and scanned exactly, as Pinecone filters before
+its nearest-neighbour search; publication IDs are held in an array next to the
+vectors so the usual publication_id filter is a vectorized comparison.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "./vector_store")
+IVF_MIN_VECTORS = int(os.getenv("LOCAL_IVF_MIN_VECTORS", "20000"))
+IVF_NPROBE = int(os.getenv("LOCAL_IVF_NPROBE", "8"))
+# Deleted rows are compacted away once they outnumber live rows and exceed this count
+COMPACT_MIN_DEAD = int(os.getenv("LOCAL_COMPACT_MIN_DEAD", "1000"))
+
+EMPTY_META = {"generation": 0, "dim": 0, "rows": 0, "dead": 0, "ivf": 0,
+              "vectors_bytes": 0, "records_bytes": 0, "deleted_bytes": 0}
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+def _matches(metadata: dict, search_filter: Optional[dict]) -> bool:
+    """Evaluate a Pinecone-style equality filter ({"field": value} or {"field": {"$eq"/"$in": ...}})."""
+    if not search_filter:
+        return True
+    for field, condition in search_filter.items():
+        value = metadata.get(field)
+        if isinstance(condition, dict):
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+def _filter_mask(publication_ids: np.ndarray, metadatas: List[dict], search_filter: dict) -> np.ndarray:
+    """Evaluate a filter over every row, comparing publication_id without touching the metadata dicts."""
+    mask = np.ones(len(publication_ids), dtype=bool)
+    for field, condition in search_filter.items():
+        if field != "publication_id":
+            # Other fields fall back to the metadata dicts; metadatas may have grown since the snapshot
+            mask &= np.fromiter((_matches(metadatas[row], {field: condition}) for row in range(len(mask))),
+                                dtype=bool, count=len(mask))
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        if "$eq" in condition:
+            mask &= publication_ids == condition["$eq"]
+        if "$in" in condition:
+            allowed = np.zeros(len(publication_ids), dtype=bool)
+            for value in condition["$in"]:
+                allowed |= publication_ids == value
+            mask &= allowed
+    return mask
+
+def _build_ivf(vectors: np.ndarray, iterations: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster vectors with spherical k-means, returning centroids and list assignments."""
+    nlist = max(int(np.sqrt(len(vectors))), 1)
+    rng = np.random.default_rng(0)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    assignments = np.zeros(len(vectors), dtype=np.int32)
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+        for c in range(nlist):
+            members = vectors[assignments == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids, assignments
+
+class LocalVectorStore:
+    """
+    A file-backed vector store with the subset of the PineconeVectorStore
+    interface used by rag_agent and the PDF pipeline, plus ID deletes.
+
+    Writes only append: vectors to a raw float32 file, records to a JSON-lines
+    file and deleted row numbers to a second JSON-lines file. meta.json is
+    replaced last and records how much of each file is committed, so readers
+    only ever load the tail written since their previous load. Deleted rows are
+    compacted away into a new generation of files once they outnumber live rows.
+    """
+
+    def __init__(self, path: str, embedding: Optional[Embeddings] = None):
+        self.path = path
+        self.embedding = embedding
+        os.makedirs(path, exist_ok=True)
+        self._meta_path = os.path.join(path, "meta.json")
+        self._ivf_path = os.path.join(path, "ivf.npz")
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._meta = dict(EMPTY_META)
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._publication_ids = np.zeros(0, dtype=object)
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows_by_id: Dict[str, int] = {}
+        # (centroids, list assignment per row, live rows when built)
+        self._ivf: Optional[Tuple[np.ndarray, np.ndarray, int]] = None
+
+    def _file(self, kind: str, generation: int) -> str:
+        return os.path.join(self.path, f"{kind}-{generation}.{'f32' if kind == 'vectors' else 'jsonl'}")
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """Serialize writers across processes, e.g. parallel DAG tasks; readers share the lock."""
+        with open(os.path.join(self.path, ".lock"), "a", encoding="utf-8") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: dict):
+        tmp_path = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, self._meta_path)
+
+    @staticmethod
+    def _read_tail(path: str, start: int, end: int) -> List[dict]:
+        if end <= start:
+            return []
+        with open(path, "rb") as file:
+            file.seek(start)
+            return [json.loads(line) for line in file.read(end - start).splitlines() if line]
+
+    def _load(self):
+        """Load whatever has been committed since the last load. Callers hold the file lock."""
+        meta = self._read_meta()
+        if meta is None:
+            self._reset()
+            return
+        if meta == self._meta:
+            return
+        if meta["generation"] != self._meta["generation"]:
+            self._reset()
+        loaded = self._meta
+        generation = meta["generation"]
+
+        records = self._read_tail(self._file("records", generation), loaded["records_bytes"], meta["records_bytes"])
+        for record in records:
+            self._rows_by_id[record["id"]] = len(self._ids)
+            self._ids.append(record["id"])
+            self._texts.append(record["text"])
+            self._metadatas.append(record["metadata"])
+        publication_ids = np.empty(len(records), dtype=object)
+        publication_ids[:] = [record["metadata"].get("publication_id") for record in records]
+        self._publication_ids = np.concatenate([self._publication_ids, publication_ids])
+        self._alive = np.concatenate([self._alive, np.ones(meta["rows"] - loaded["rows"], dtype=bool)])
+        for rows in self._read_tail(self._file("deleted", generation), loaded["deleted_bytes"], meta["deleted_bytes"]):
+            for row in rows:
+                self._alive[row] = False
+                if self._rows_by_id.get(self._ids[row]) == row:
+                    del self._rows_by_id[self._ids[row]]
+
+        self._vectors = (
+            np.memmap(self._file("vectors", generation), dtype=np.float32, mode="r", shape=(meta["rows"], meta["dim"]))
+            if meta["rows"] else np.zeros((0, 0), dtype=np.float32)
+        )
+
+        # Pick up a rebuilt IVF, and assign rows appended since the build to their nearest list
+        if meta["ivf"] != loaded["ivf"]:
+            self._ivf = None
+            if meta["ivf"] and os.path.exists(self._ivf_path):
+                ivf = np.load(self._ivf_path)
+                self._ivf = (ivf["centroids"], ivf["assignments"], int(ivf["live"]))
+        if self._ivf is not None and len(self._ivf[1]) < meta["rows"]:
+            centroids, assignments, live = self._ivf
+            tail = np.asarray(self._vectors[len(assignments):])
+            assignments = np.concatenate([assignments, np.argmax(tail @ centroids.T, axis=1).astype(np.int32)])
+            self._ivf = (centroids, assignments, live)
+        self._meta = meta
+
+    def _append(self, path: str, committed: int, data: bytes) -> int:
+        with open(path, "ab") as file:
+            # Drop anything an interrupted writer left past the committed length
+            file.truncate(committed)
+            file.write(data)
+        return committed + len(data)
+
+    def _commit(self, vectors: Optional[np.ndarray] = None, records: Tuple = (), deleted: Tuple = ()):
+        """Append rows and deletions, then publish them in meta.json. Callers hold the exclusive lock."""
+        meta = dict(self._meta)
+        generation = meta["generation"]
+        if vectors is not None and len(vectors):
+            meta["dim"] = meta["dim"] or vectors.shape[1]
+            meta["vectors_bytes"] = self._append(
+                self._file("vectors", generation), meta["vectors_bytes"], vectors.astype(np.float32).tobytes()
+            )
+            meta["rows"] += len(vectors)
+        if records:
+            meta["records_bytes"] = self._append(
+                self._file("records", generation), meta["records_bytes"],
+                "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+            )
+        if deleted:
+            meta["deleted_bytes"] = self._append(
+                self._file("deleted", generation), meta["deleted_bytes"], (json.dumps(list(deleted)) + "\n").encode("utf-8")
+            )
+            meta["dead"] += len(deleted)
+        self._write_meta(meta)
+        self._load()
+        if meta["dead"] > max(COMPACT_MIN_DEAD, meta["rows"] - meta["dead"]):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite live rows into a new generation of files. Callers hold the exclusive lock."""
+        live = np.flatnonzero(self._alive)
+        old_generation = self._meta["generation"]
+        meta = {**EMPTY_META, "generation": old_generation + 1, "dim": self._meta["dim"]}
+        generation = meta["generation"]
+        for kind in ("vectors", "records", "deleted"):
+            if os.path.exists(self._file(kind, generation)):
+                os.remove(self._file(kind, generation))
+        if len(live):
+            meta["vectors_bytes"] = self._append(
+                self._file("vectors", generation), 0, np.asarray(self._vectors[live], dtype=np.float32).tobytes()
+            )
+            meta["records_bytes"] = self._append(
+                self._file("records", generation), 0,
+                "".join(
+                    json.dumps({"id": self._ids[row], "text": self._texts[row], "metadata": self._metadatas[row]}) + "\n"
+                    for row in live
+                ).encode("utf-8")
+            )
+            meta["rows"] = len(live)
+        self._write_meta(meta)
+        # Row numbers change, so the IVF is rebuilt on the next query that needs it
+        for old_path in [self._file(kind, old_generation) for kind in ("vectors", "records", "deleted")] + [self._ivf_path]:
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        self._reset()
+        self._load()
+
+    def add_texts(
+        self,
+        texts: List[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+        **kwargs # pylint: disable=unused-argument
+    ) -> List[str]:
+        """
+        Add texts, replacing any existing entries with the same IDs.
+        """
+        if not texts:
+            return []
+        if embeddings is None:
+            embeddings = self.embedding.embed_documents(texts)
+        ids = ids or [hashlib.sha1(text.encode("utf-8")).hexdigest() for text in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        # Only the last occurrence of an ID within one call is kept
+        last = {entry_id: i for i, entry_id in enumerate(ids)}
+        keep = sorted(last.values())
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32)[keep])
+        records = tuple({"id": ids[i], "text": texts[i], "metadata": metadatas[i]} for i in keep)
+        with self._lock, self._file_lock(exclusive=True):
+            self._load()
+            replaced = tuple(self._rows_by_id[entry_id] for entry_id in last if entry_id in self._rows_by_id)
+            self._commit(vectors, records, replaced)
+        return ids
+
+    def list_ids(self, prefix: str = "") -> List[str]:
+        """
+        List the IDs of entries starting with prefix.
+        """
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                self._load()
+            return [entry_id for entry_id in self._rows_by_id if entry_id.startswith(prefix)]
+
+    def delete(self, ids: List[str]) -> int:
+        """
+        Delete entries by ID, returning how many were removed.
+        """
+        if not ids:
+            return 0
+        with self._lock, self._file_lock(exclusive=True):
+            self._load()
+            rows = tuple(sorted({self._rows_by_id[entry_id] for entry_id in ids if entry_id in self._rows_by_id}))
+            if rows:
+                self._commit(deleted=rows)
+        return len(rows)
+
+    def build_index(self):
+        """
+        Cluster the live vectors into IVF lists. Queries build it lazily once the store
+        reaches LOCAL_IVF_MIN_VECTORS and rebuild it after the store doubles in size.
+        """
+        with self._lock, self._file_lock(exclusive=True):
+            self._load()
+            live = np.flatnonzero(self._alive)
+            if not len(live):
+                return
+            centroids, live_assignments = _build_ivf(np.asarray(self._vectors[live]))
+            assignments = np.zeros(len(self._alive), dtype=np.int32)
+            assignments[live] = live_assignments
+            tmp_path = f"{self._ivf_path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_path, centroids=centroids, assignments=assignments, live=len(live))
+            os.replace(tmp_path, self._ivf_path)
+            self._write_meta({**self._meta, "ivf": self._meta["ivf"] + 1})
+            self._load()
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None, # pylint: disable=redefined-builtin
+        **kwargs # pylint: disable=unused-argument
+    ) -> List[Tuple[Document, float]]:
+        """
+        Return the k most similar entries by cosine similarity.
+        """
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                self._load()
+            live = len(self._rows_by_id)
+            if not filter and live >= IVF_MIN_VECTORS and (self._ivf is None or live > 2 * self._ivf[2]):
+                self.build_index()
+            vectors, alive, ivf = self._vectors, self._alive.copy(), self._ivf
+            ids, texts, metadatas = self._ids, self._texts, self._metadatas
+            publication_ids = self._publication_ids
+        if not alive.any():
+            return []
+
+        query = _normalize(np.asarray([embedding], dtype=np.float32))[0]
+        if filter:
+            # Filter first and scan the matching rows exactly; probing lists would drop most of them
+            alive &= _filter_mask(publication_ids, metadatas, filter)
+        elif ivf is not None:
+            centroids, assignments, _ = ivf
+            probes = np.argsort(centroids @ query)[::-1][:IVF_NPROBE]
+            alive &= np.isin(assignments[:len(alive)], probes)
+        candidates = np.flatnonzero(alive)
+        if not len(candidates):
+            return []
+
+        scores = np.asarray(vectors[candidates] @ query)
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(id=ids[candidates[i]], page_content=texts[candidates[i]], metadata=metadatas[candidates[i]]),
+             float(scores[i]))
+            for i in top
+        ]
+
+class HashingEmbeddings(Embeddings):
+    """
+    A deterministic, network-free feature-hashing embedder for development and CI
+    (EMBEDDING_BACKEND=hashing). It is not a substitute for a trained model.
+    """
+
+    def __init__(self, dimension: int = 1024):
+        self.model = f"hashing-{dimension}"
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimension] += 1 if digest[4] & 1 else -1
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+class LocalIndexRegistry:
+    """
+    Hands out LocalVectorStore instances, mirroring PineconeIndexRegistry.
+    """
+
+    def __init__(self, root: str = LOCAL_VECTOR_STORE_DIR, embedding: Optional[Embeddings] = None):
+        self.root = root
+        self.embedding = embedding
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def get_vector_store(self, index_name: str) -> Optional[LocalVectorStore]:
+        """
+        Get the store for an index, or None if nothing has been written to it.
+        """
+        if not os.path.exists(os.path.join(self.root, index_name, "meta.json")):
+            return None
+        with self._lock:
+            if index_name not in self._stores:
+                self._stores[index_name] = LocalVectorStore(os.path.join(self.root, index_name), self.embedding)
+            return self._stores[index_name]
@@ -2,36 +2,69 @@
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
 import os
-import snowflake.connector
+import random
+import time
 import boto3
-from io import BytesIO
+from botocore.exceptions import ClientError
 from urllib.parse import urlparse
 from dotenv import load_dotenv
-from docling.datamodel.base_models import DocumentStream
-from docling.document_converter import DocumentConverter
-from docling_core.transforms.chunker import HierarchicalChunker
 from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings
 from requests.exceptions import HTTPError
-from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone as PineconeClient, ServerlessSpec
+from common.snowflake_pool import get_pool
+from common.embedding_cache import CachedEmbeddings, embedding_cache
+from common.local_vector_store import HashingEmbeddings, LocalVectorStore, LOCAL_VECTOR_STORE_DIR
+from common.docling_pool import DoclingConverterPool, DOCLING_WORKERS
+from common.chunk_store import CHUNK_ARTIFACT_URI, artifact_uri, delete_artifact, iter_chunk_batches, write_chunks
 
 # Load environment variables
 load_dotenv()
 
+# "pinecone" or "local"; "hashing" embeddings run without a network for development and CI
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "nvidia")
+
 # Initialize global clients
-embedding_client = NVIDIAEmbeddings(
-    model="nvidia/nv-embedqa-e5-v5",
-    api_key=os.getenv("NVIDIA_API_KEY"),
-    truncate="END"
-)
+if EMBEDDING_BACKEND == "hashing":
+    base_embedding_client = HashingEmbeddings()
+else:
+    base_embedding_client = NVIDIAEmbeddings(
+        model="nvidia/nv-embedqa-e5-v5",
+        api_key=os.getenv("NVIDIA_API_KEY"),
+        truncate="END"
+    )
+embedding_client = CachedEmbeddings(base_embedding_client, embedding_cache)
 s3 = boto3.client(
     's3',
     aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
     aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
     region_name=os.getenv("AWS_REGION")
 )
-pc = PineconeClient(api_key=os.getenv('PINECONE_API_KEY'))
+pc = PineconeClient(api_key=os.getenv('PINECONE_API_KEY')) if VECTOR_STORE_BACKEND == "pinecone" else None
+
+# All publications share one index; chunks carry a publication_id for filtering
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "research-publications")
+
+# Chunks per embed_documents call, concurrent embedding calls, and retries on rate limits
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+UPSERT_BATCH_SIZE = 100
+
+# Maximum number of documents processed or indexed at once
+PDF_PIPELINE_PARALLELISM = int(os.getenv("PDF_PIPELINE_PARALLELISM", "4"))
+
+# Documents converted per processing task, sharing one warm pool of DOCLING_WORKERS converters
+PDF_CONVERT_BATCH_SIZE = int(os.getenv("PDF_CONVERT_BATCH_SIZE", "8"))
+
+# Bump when chunking changes so every document is re-chunked and re-embedded
+CHUNKER_VERSION = "hierarchical-v1"
+EMBEDDING_MODEL = embedding_client.model
+MANIFEST_PREFIX = "processed/manifest"
 
 default_args = {
     'owner': 'airflow',
@@ -41,27 +74,23 @@ default_args = {
 }
 
 def fetch_pdf_data_from_snowflake(**kwargs):
-    conn = snowflake.connector.connect(
-        user=os.getenv("SNOWFLAKE_USER"),
-        password=os.getenv("SNOWFLAKE_PASSWORD"),
-        account=os.getenv("SNOWFLAKE_ACCOUNT"),
-        warehouse=os.getenv("SNOWFLAKE_WAREHOUSE", "WH_PUBLICATIONS_ETL"),
-        database=os.getenv("SNOWFLAKE_DATABASE", "RESEARCH_PUBLICATIONS"),
-        schema=os.getenv("SNOWFLAKE_SCHEMA", "RESEARCH_PUBLICATIONS"),
-        role=os.getenv("SNOWFLAKE_ROLE")
-    )
-    cursor = conn.cursor()
-
     table_name = os.getenv("SNOWFLAKE_TABLE", "PUBLICATION_LIST")
 
-    query = f"SELECT id, title, pdf_link FROM {table_name};"
-    cursor.execute(query)
-    records = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
-    # Push records to XCom for use in downstream tasks
-    kwargs['ti'].xcom_push(key='pdf_data', value=records)
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            query = f"SELECT id, title, pdf_link FROM {table_name};"
+            cursor.execute(query)
+            records = cursor.fetchall()
+        finally:
+            cursor.close()
+    # Return batches of publications; processing is mapped over batches so each task
+    # instance loads Docling models once for the whole batch
+    documents = [{"id": id, "title": title, "pdf_link": pdf_link} for id, title, pdf_link in records]
+    return [
+        {"documents": documents[i:i + PDF_CONVERT_BATCH_SIZE]}
+        for i in range(0, len(documents), PDF_CONVERT_BATCH_SIZE)
+    ]
 
 def parse_s3_url(s3_url):
     parsed_url = urlparse(s3_url)
@@ -69,69 +98,243 @@ def parse_s3_url(s3_url):
     key = parsed_url.path.lstrip('/')
     return bucket, key
 
-def process_and_chunk_pdf(pdf_link, title, id, **kwargs):
+def load_manifest(bucket, id):
+    """Load the manifest of what was last indexed for a document, or None."""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=f"{MANIFEST_PREFIX}/{id}.json")
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return None
+        raise
+    return json.loads(response['Body'].read())
+
+def save_manifest(bucket, id, manifest):
+    s3.put_object(Bucket=bucket, Key=f"{MANIFEST_PREFIX}/{id}.json", Body=json.dumps(manifest).encode('utf-8'))
+
+def is_current(manifest, title):
+    """Whether a manifest was produced by the current chunker and embedding model into the current index."""
+    return (
+        manifest is not None
+        and manifest.get("chunker_version") == CHUNKER_VERSION
+        and manifest.get("embedding_model") == EMBEDDING_MODEL
+        and manifest.get("vector_store_backend") == VECTOR_STORE_BACKEND
+        and manifest.get("index_name") == PINECONE_INDEX_NAME
+        and manifest.get("title") == title
+    )
+
+def process_and_chunk_pdf(pdf_link, title, id, converter_pool, **kwargs):
+    start = time.perf_counter()
     bucket, key = parse_s3_url(pdf_link)
-    
+    manifest = load_manifest(bucket, id)
+
+    # Skip documents whose PDF has not changed since they were last indexed
+    etag = s3.head_object(Bucket=bucket, Key=key)['ETag']
+    if is_current(manifest, title) and manifest.get("etag") == etag:
+        print(f"Document {id} is unchanged (ETag {etag}); skipping.")
+        return {"id": id, "title": title, "chunks": None}
+
     pdf_obj = s3.get_object(Bucket=bucket, Key=key)
     pdf_content = pdf_obj['Body'].read()
-    pdf_stream = DocumentStream(name=os.path.basename(key), stream=BytesIO(pdf_content))
-    
-    converter = DocumentConverter()
-    docling_result = converter.convert(pdf_stream)
-    
-    markdown_content = docling_result.document.export_to_markdown()
-    
+    etag = pdf_obj['ETag']
+    content_hash = hashlib.sha256(pdf_content).hexdigest()
+    if is_current(manifest, title) and manifest.get("content_hash") == content_hash:
+        # Re-uploaded with identical content: record the new ETag and skip conversion
+        save_manifest(bucket, id, {**manifest, "etag": etag})
+        print(f"Document {id} content is unchanged (hash {content_hash[:12]}); skipping.")
+        return {"id": id, "title": title, "chunks": None}
+
+    conversion = converter_pool.convert(os.path.basename(key), pdf_content)
+    print(f"Converted document {id} in {conversion['seconds']:.1f}s ({'warm' if conversion['warm'] else 'cold'} converter)")
+
     markdown_key = f"processed/dockling/{os.path.basename(key).replace('.pdf', '.md')}"
-    s3.put_object(Bucket=bucket, Key=markdown_key, Body=markdown_content.encode('utf-8'))
+    s3.put_object(Bucket=bucket, Key=markdown_key, Body=conversion["markdown"].encode('utf-8'))
     print(f"Markdown saved to S3 at {markdown_key}")
 
-    chunker = HierarchicalChunker()
-    chunks = list(chunker.chunk(docling_result.document))
-    chunk_texts = [chunk.text for chunk in chunks]
-
-    # Push chunk texts to XCom for indexing in Pinecone
-    kwargs['ti'].xcom_push(key=f'chunks_{id}', value=chunk_texts)
-
-def create_index_in_pinecone(id, title, **kwargs):
-    index_name = f"pdf-index-{id}"
-    
-    if index_name in pc.list_indexes().names():
-        pc.delete_index(index_name)
-        print(f"Deleted existing index: {index_name}")
-    
-    if index_name not in pc.list_indexes().names():
+    # Deduplicate identical chunks; their content-addressed IDs would collide
+    chunks_by_id = {}
+    for chunk in conversion["chunks"]:
+        chunks_by_id.setdefault(chunk_id(id, chunk), chunk)
+
+    # Write the chunks to a Parquet artifact; only its reference goes through XCom
+    root = CHUNK_ARTIFACT_URI or f"s3://{bucket}/processed/chunks"
+    chunks_ref = write_chunks(
+        artifact_uri(root, f"{kwargs['run_id']}/{id}.parquet"), list(chunks_by_id), list(chunks_by_id.values())
+    )
+    print(f"Processed document {id} into {chunks_ref['num_chunks']} chunks in {time.perf_counter() - start:.1f}s; "
+          f"artifact at {chunks_ref['uri']}")
+
+    # The manifest is only written once indexing succeeds
+    return {
+        "id": id,
+        "title": title,
+        "chunks": chunks_ref,
+        "bucket": bucket,
+        "source": {"etag": etag, "content_hash": content_hash}
+    }
+
+def process_pdf_batch(documents, **kwargs):
+    """
+    Process a batch of documents against one pool of warm Docling converters.
+    A document that fails is returned with its error instead of failing the batch;
+    its own mapped indexing task then reprocesses it, so each document is retried on its own.
+    """
+    with DoclingConverterPool(DOCLING_WORKERS) as converter_pool:
+        # Threads overlap S3 transfers and keep every converter process busy
+        with ThreadPoolExecutor(max_workers=converter_pool.workers) as executor:
+            futures = [
+                executor.submit(process_and_chunk_pdf, converter_pool=converter_pool, **document, **kwargs)
+                for document in documents
+            ]
+            results = []
+            for document, future in zip(documents, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e: # pylint: disable=broad-except
+                    print(f"Processing document {document['id']} failed: {e}")
+                    results.append({**document, "chunks": None, "error": f"{type(e).__name__}: {e}"})
+            return results
+
+def collect_processed_documents(**kwargs):
+    """Flatten the per-batch results so indexing is mapped per document."""
+    batches = kwargs['ti'].xcom_pull(task_ids='process_pdfs')
+    return [result for batch in batches or [] for result in batch]
+
+def get_pinecone_index():
+    """Return the shared index, creating it on first use."""
+    if PINECONE_INDEX_NAME not in pc.list_indexes().names():
         pc.create_index(
-            name=index_name,
+            name=PINECONE_INDEX_NAME,
             dimension=1024,
             metric="cosine",
             spec=ServerlessSpec(cloud="aws", region="us-east-1")
         )
-    
-    pinecone_index = pc.Index(index_name)
-    vector_store = PineconeVectorStore(index=pinecone_index, embedding=embedding_client)
-
-    # Fetch chunks from XCom
-    chunks = kwargs['ti'].xcom_pull(key=f'chunks_{id}')
-    documents = []
-    for i, chunk in enumerate(chunks):
+        print(f"Created index: {PINECONE_INDEX_NAME}")
+    return pc.Index(PINECONE_INDEX_NAME)
+
+def chunk_id_prefix(id):
+    return f"pub-{id}#"
+
+def chunk_id(id, chunk):
+    """Content-addressed chunk ID, so unchanged chunks keep their ID when others change."""
+    return f"{chunk_id_prefix(id)}{hashlib.sha256(chunk.encode('utf-8')).hexdigest()[:32]}"
+
+def list_publication_chunk_ids(pinecone_index, id):
+    """List a publication's existing chunk IDs by prefix, leaving other documents untouched."""
+    return {chunk for ids in pinecone_index.list(prefix=chunk_id_prefix(id)) for chunk in ids}
+
+def _is_retryable(error):
+    """Rate limits and transient server errors are retried; anything else fails the batch."""
+    if isinstance(error, HTTPError) and error.response is not None:
+        return error.response.status_code in (429, 500, 502, 503, 504)
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+def embed_batch_with_retry(batch):
+    """Embed one batch of chunks, backing off exponentially with jitter on rate limits."""
+    for attempt in range(EMBED_MAX_RETRIES):
         try:
-            embedding = embedding_client.embed_query(chunk)
-            document = {
-                "id": f"{id}-{i}",
-                "text": chunk,
-                "embedding": embedding,
-                "metadata": {"title": title}
-            }
-            documents.append(document)
-        except HTTPError as e:
+            return embedding_client.embed_documents(batch)
+        except Exception as e:
             if "expired" in str(e).lower():
-                print(f"Error: NVIDIA API credits expired. Unable to process chunk {i} for document ID {id}.")
-                break
-            else:
-                print(f"Error processing chunk {i} for document ID {id}: {e}")
+                raise RuntimeError("NVIDIA API credits expired.") from e
+            if attempt == EMBED_MAX_RETRIES - 1 or not _is_retryable(e):
+                raise
+            delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+            print(f"Embedding batch rate limited ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def embed_chunks(chunks):
+    """Embed chunks in batches with bounded concurrency, preserving order."""
+    batches = [chunks[i:i + EMBED_BATCH_SIZE] for i in range(0, len(chunks), EMBED_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY) as executor:
+        return [embedding for batch in executor.map(embed_batch_with_retry, batches) for embedding in batch]
+
+def index_chunks_in_pinecone(id, title, chunks, bucket=None, source=None, pdf_link=None, error=None, **kwargs):
+    if error:
+        # Processing failed within its batch; reprocess just this document here, so a
+        # failure (or a retry of this task) only affects this document
+        print(f"Processing document {id} failed in its batch ({error}); reprocessing it.")
+        with DoclingConverterPool(1) as converter_pool:
+            processed = process_and_chunk_pdf(pdf_link, title, id, converter_pool=converter_pool, **kwargs)
+        chunks, bucket, source = processed["chunks"], processed.get("bucket"), processed.get("source")
+
+    if chunks is None:
+        print(f"Document {id} is unchanged; nothing to index.")
+        return
+    if not chunks["num_chunks"]:
+        # Still fall through: earlier chunks are pruned, and the manifest and artifact
+        # are handled below so the document is not reconverted on every run
+        print(f"No chunks to index for document {id}.")
+
+    # Only the ID column is read to plan the update; chunk text is streamed below
+    start = time.perf_counter()
+    new_ids = {
+        chunk for batch in iter_chunk_batches(chunks["uri"], UPSERT_BATCH_SIZE * 10, columns=["chunk_id"])
+        for (chunk,) in batch
+    }
 
-    vector_store.add_texts([doc['text'] for doc in documents], embeddings=[doc['embedding'] for doc in documents])
-    print(f"Chunks for document {id} with title '{title}' indexed in Pinecone.")
+    if VECTOR_STORE_BACKEND == "local":
+        vector_store = LocalVectorStore(os.path.join(LOCAL_VECTOR_STORE_DIR, PINECONE_INDEX_NAME), embedding_client)
+    else:
+        pinecone_index = get_pinecone_index()
+
+    # Incremental updates embed only chunks new since the last indexed version; full
+    # updates re-embed everything, replacing vectors in place before pruning the rest
+    manifest = load_manifest(bucket, id)
+    incremental = is_current(manifest, title)
+    if incremental:
+        previous_ids = set(manifest.get("chunk_ids", []))
+    elif VECTOR_STORE_BACKEND == "local":
+        previous_ids = set(vector_store.list_ids(chunk_id_prefix(id)))
+    else:
+        previous_ids = list_publication_chunk_ids(pinecone_index, id)
+    to_embed = new_ids - previous_ids if incremental else new_ids
+    stale_ids = sorted(previous_ids - new_ids)
+    print(f"Document {id}: {len(to_embed)} chunks to embed, {len(new_ids) - len(to_embed)} unchanged, "
+          f"{len(stale_ids)} removed ({'incremental' if incremental else 'full'} update).")
+
+    # Stream the artifact so only one window of chunks and vectors is in memory at a time
+    embedded = 0
+    for batch in iter_chunk_batches(chunks["uri"], EMBED_BATCH_SIZE * EMBED_CONCURRENCY):
+        batch = [(chunk, text) for chunk, text in batch if chunk in to_embed]
+        if not batch:
+            continue
+        ids = [chunk for chunk, _ in batch]
+        texts = [text for _, text in batch]
+        embeddings = embed_chunks(texts)
+        metadatas = [{"publication_id": id, "title": title} for _ in texts]
+        if VECTOR_STORE_BACKEND == "local":
+            vector_store.add_texts(texts, metadatas=metadatas, ids=ids, embeddings=embeddings)
+        else:
+            # Upsert the computed vectors directly; "text" is the key PineconeVectorStore reads content from
+            vectors = [
+                {"id": chunk, "values": embedding, "metadata": {**metadata, "text": text}}
+                for chunk, embedding, metadata, text in zip(ids, embeddings, metadatas, texts)
+            ]
+            for i in range(0, len(vectors), UPSERT_BATCH_SIZE):
+                pinecone_index.upsert(vectors=vectors[i:i + UPSERT_BATCH_SIZE])
+        embedded += len(texts)
+
+    if VECTOR_STORE_BACKEND == "local":
+        vector_store.delete(stale_ids)
+    else:
+        for i in range(0, len(stale_ids), UPSERT_BATCH_SIZE):
+            pinecone_index.delete(ids=stale_ids[i:i + UPSERT_BATCH_SIZE])
+
+    save_manifest(bucket, id, {
+        **(source or {}),
+        "title": title,
+        "chunker_version": CHUNKER_VERSION,
+        "embedding_model": EMBEDDING_MODEL,
+        "vector_store_backend": VECTOR_STORE_BACKEND,
+        "index_name": PINECONE_INDEX_NAME,
+        "chunk_ids": sorted(new_ids),
+        "indexed_at": datetime.utcnow().isoformat()
+    })
+    delete_artifact(chunks["uri"])
+
+    print(f"Embedded and indexed {embedded} chunks for document {id} with title '{title}' in {VECTOR_STORE_BACKEND} "
+          f"index '{PINECONE_INDEX_NAME}' in {time.perf_counter() - start:.1f}s.")
 
 with DAG(
     'pdf_processing_pipeline',
@@ -148,27 +351,24 @@ with DAG(
         provide_context=True
     )
 
-    def process_pdf_task(**kwargs):
-        pdf_data = kwargs['ti'].xcom_pull(key='pdf_data')
-        for id, title, pdf_link in pdf_data:
-            process_and_chunk_pdf(pdf_link, title, id, **kwargs)
-
-    process_data_task = PythonOperator(
+    # One mapped task instance per batch of publications, each with its own warm converter pool
+    process_data_task = PythonOperator.partial(
         task_id='process_pdfs',
-        python_callable=process_pdf_task,
-        provide_context=True
-    )
+        python_callable=process_pdf_batch,
+        max_active_tis_per_dag=PDF_PIPELINE_PARALLELISM
+    ).expand(op_kwargs=fetch_data_task.output)
 
-    def index_task(**kwargs):
-        pdf_data = kwargs['ti'].xcom_pull(key='pdf_data')
-        for id, title, _ in pdf_data:
-            create_index_in_pinecone(id, title, **kwargs)
+    collect_data_task = PythonOperator(
+        task_id='collect_processed_documents',
+        python_callable=collect_processed_documents
+    )
 
-    index_data_task = PythonOperator(
+    # One mapped task instance per publication, so each document is indexed, retried and timed on its own
+    index_data_task = PythonOperator.partial(
         task_id='index_pinecone',
-        python_callable=index_task,
-        provide_context=True
-    )
+        python_callable=index_chunks_in_pinecone,
+        max_active_tis_per_dag=PDF_PIPELINE_PARALLELISM
+    ).expand(op_kwargs=collect_data_task.output)
 
     # Define the order of tasks
-    fetch_data_task >> process_data_task >> index_data_task
+    fetch_data_task >> process_data_task >> collect_data_task >> index_data_task
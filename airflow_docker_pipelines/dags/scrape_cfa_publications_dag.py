@@ -1,18 +1,21 @@
 #scrape_cfa_publications_dag.py
+import hashlib
+import json
 import os
+import re
 import pandas as pd
 import boto3
 import requests
 import time
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from io import StringIO, BytesIO
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 from datetime import datetime
 from dotenv import load_dotenv
 from airflow import DAG
 from airflow.operators.python import PythonOperator
+from common.cfa_scraper import CFAScraper
 
 load_dotenv()
 
@@ -22,49 +25,93 @@ aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
 aws_region = os.getenv('AWS_REGION')
 s3_bucket_name = os.getenv('S3_BUCKET_NAME')
 
-# Function to initialize Selenium WebDriver
-def init_driver():
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1920,1080")
-    
-    service = Service("/usr/local/bin/chromedriver")
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    return driver
+# Number of listing pages of 10 publications to scrape
+SCRAPER_PAGES = int(os.getenv("SCRAPER_PAGES", "10"))
+
+# Previous scrape state, where each run's delta CSV of new or changed publications is written
+# (the Snowflake load consumes and archives them), and whether to ignore the state
+SCRAPE_STATE_KEY = os.getenv("SCRAPE_STATE_KEY", "raw/scrape_state.json")
+DELTA_CSV_PREFIX = os.getenv("DELTA_CSV_PREFIX", "raw/publications_delta/")
+SCRAPE_FULL_REFRESH = os.getenv("SCRAPE_FULL_REFRESH", "false").lower() == "true"
+CSV_COLUMNS = ['title', 'summary', 'date', 'authors', 'cover_path', 'publication_path']
+
+# Concurrent file transfers, and the multipart part size that bounds each transfer's buffer
+TRANSFER_CONCURRENCY = int(os.getenv("TRANSFER_CONCURRENCY", "8"))
+TRANSFER_TIMEOUT = float(os.getenv("TRANSFER_TIMEOUT", "60"))
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=2
+)
 
-# Function to download files and upload them to S3 using an in-memory buffer
-def download_and_upload_file(url, s3_dir, s3_bucket_name, aws_region, s3):
+# Function to stream a file from its URL into S3, skipping it when S3 already holds the same file
+def download_and_upload_file(url, s3_dir, s3_bucket_name, aws_region, s3, session=None):
     if url:
+        session = session or requests
         file_name = os.path.basename(url.split('?')[0])
-        response = requests.get(url, stream=True)
-        if response.status_code == 200:
-            file_buffer = BytesIO(response.content)
-            s3_key = f"{s3_dir}/{file_name}"
-            s3.upload_fileobj(file_buffer, s3_bucket_name, s3_key)
-            s3_url = f"https://{s3_bucket_name}.s3.{aws_region}.amazonaws.com/{s3_key}"
+        s3_key = f"{s3_dir}/{file_name}"
+        s3_url = f"https://{s3_bucket_name}.s3.{aws_region}.amazonaws.com/{s3_key}"
+
+        response = session.get(url, stream=True, timeout=TRANSFER_TIMEOUT)
+        with response:
+            if response.status_code != 200:
+                return None
+            source_etag = response.headers.get('ETag', '').strip('"')
+            # Content-Length is only the file size when the body is not content-encoded
+            source_length = None if response.headers.get('Content-Encoding') else response.headers.get('Content-Length')
+
+            # Compare against what is already in S3 before reading the body
+            try:
+                existing = s3.head_object(Bucket=s3_bucket_name, Key=s3_key)
+            except ClientError:
+                existing = None
+            if existing is not None:
+                existing_etag = existing.get('Metadata', {}).get('source-etag')
+                if (source_etag and existing_etag == source_etag) or (
+                        not source_etag and source_length and existing['ContentLength'] == int(source_length)):
+                    print(f"Skipping {file_name}; s3://{s3_bucket_name}/{s3_key} is up to date.")
+                    return s3_url
+
+            # Pipe the body into a multipart upload; only a few parts are buffered at a time
+            response.raw.decode_content = True
+            extra_args = {'Metadata': {'source-etag': source_etag}}
+            if response.headers.get('Content-Type'):
+                extra_args['ContentType'] = response.headers['Content-Type']
+            s3.upload_fileobj(response.raw, s3_bucket_name, s3_key, ExtraArgs=extra_args, Config=TRANSFER_CONFIG)
+            print(f"Uploaded {file_name} to s3://{s3_bucket_name}/{s3_key}")
             return s3_url
     return None
 
-# Function to handle PDF extraction
-def extract_pdf_link(pdf_soup):
-    primary_link = pdf_soup.find('a', class_='content-asset--primary', href=True)
-    if primary_link and '.pdf' in primary_link['href']:
-        return primary_link['href'] if primary_link['href'].startswith('http') else f"https://rpc.cfainstitute.org{primary_link['href']}"
-    
-    secondary_pdf_tag = pdf_soup.find('a', class_='items__item', href=True)
-    if secondary_pdf_tag and '.pdf' in secondary_pdf_tag['href']:
-        return secondary_pdf_tag['href'] if secondary_pdf_tag['href'].startswith('http') else f"https://rpc.cfainstitute.org{secondary_pdf_tag['href']}"
-    
-    return None
+# Function to wait for a transfer, returning None when it failed so the publication is retried
+def transfer_result(future):
+    try:
+        return future.result()
+    except Exception as e: # pylint: disable=broad-except
+        print(f"Transfer failed: {e}")
+        return None
 
-# Function to scrape publications using Selenium and save data as a pandas DataFrame
+# Function to load the state of the previous scrape, keyed by publication page URL
+def load_scrape_state(s3):
+    if SCRAPE_FULL_REFRESH:
+        print("Full refresh requested; ignoring previous scrape state.")
+        return {}
+    try:
+        response = s3.get_object(Bucket=s3_bucket_name, Key=SCRAPE_STATE_KEY)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return {}
+        raise
+    return json.loads(response['Body'].read())
+
+# Function to hash the scraped fields of a publication, so changes upstream can be detected
+def publication_hash(pub):
+    fields = [pub.get(field) or "" for field in ('title', 'summary', 'date', 'authors', 'image_url', 'pdf_link')]
+    return hashlib.sha256("\0".join(fields).encode('utf-8')).hexdigest()
+
+# Function to scrape publications with a pool of headless browsers and save data as a pandas DataFrame
 def scrape_publications_with_selenium(**kwargs):
     print("Starting publication scraping process...")
     s3 = boto3.client('s3', aws_access_key_id=aws_access_key, aws_secret_access_key=aws_secret_key, region_name=aws_region)
-    driver = init_driver()
     all_data = []
 
     # Titles to filter for
@@ -74,66 +121,83 @@ def scrape_publications_with_selenium(**kwargs):
         'The Evolution of Asset/Liability Management'
     }
 
-    for page_num in range(0, 100, 10):
-        base_url = f"https://rpc.cfainstitute.org/en/research-foundation/publications#first={page_num}&sort=%40officialz32xdate%20descending"
-        print(f"Loading page {page_num // 10 + 1}...")
-        driver.get(base_url)
-        time.sleep(10)
+    # Paging stops at already known publications, and unchanged detail pages are not re-parsed
+    state = load_scrape_state(s3)
+    start = time.perf_counter()
+    scraper = CFAScraper()
+    scraped = scraper.scrape(pages=SCRAPER_PAGES, target_titles=target_titles, known=state)
+    print(f"Scraped {len(scraped)} publications in {time.perf_counter() - start:.1f}s ({scraper.stats})")
 
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        publications = soup.find_all('div', class_='coveo-list-layout CoveoResult')
+    # Remember every listed publication so the next run can stop paging when it reaches them
+    new_state = dict(state)
+    for pub in scraper.seen:
+        if pub['href'] and pub['href'] not in new_state:
+            new_state[pub['href']] = {'title': pub['title']}
 
-        for pub in publications:
-            title_tag = pub.find('a', class_='CoveoResultLink')
-            title = title_tag.text.strip() if title_tag else None
+    # Only new or changed publications are transferred and written to the delta CSV
+    publications = []
+    for pub in scraped:
+        content_hash = publication_hash(pub)
+        known = state.get(pub['href'], {})
+        if known.get('content_hash') == content_hash and known.get('row'):
+            continue
+        publications.append({**pub, 'content_hash': content_hash})
+    print(f"{len(publications)} of {len(scraped)} scraped publications are new or changed.")
 
-            # Check if the title is in the target list
-            if title not in target_titles:
-                continue
+    # Transfer covers and PDFs concurrently, sharing one pooled HTTP session
+    start = time.perf_counter()
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=TRANSFER_CONCURRENCY))
+    with ThreadPoolExecutor(max_workers=TRANSFER_CONCURRENCY) as executor:
+        transfers = [
+            (
+                executor.submit(download_and_upload_file, pub['image_url'], 'raw/publication_covers', s3_bucket_name, aws_region, s3, session) if pub['image_url'] else None,
+                executor.submit(download_and_upload_file, pub['pdf_link'], 'raw/publications', s3_bucket_name, aws_region, s3, session) if pub['pdf_link'] else None
+            )
+            for pub in publications
+        ]
+        failed = 0
+        for pub, (image_future, pdf_future) in zip(publications, transfers):
+            s3_image_url = transfer_result(image_future) if image_future else "NA"
+            s3_pdf_url = transfer_result(pdf_future) if pdf_future else "NA"
 
-            print(f"Scraping publication: {title}")
-            href = title_tag['href'] if title_tag else None
-            href = f"https://rpc.cfainstitute.org{href}" if href and href.startswith('/') else href
-
-            image_tag = pub.find('img', class_='coveo-result-image')
-            image_url = image_tag['src'] if image_tag else None
-            image_url = f"https://rpc.cfainstitute.org{image_url}" if image_url and image_url.startswith('/') else image_url
-
-            summary_tag = pub.find('div', class_='result-body')
-            summary = summary_tag.text.strip() if summary_tag else None
-
-            pdf_link = None
-            if href:
-                driver.get(href)
-                time.sleep(5)
-                pdf_soup = BeautifulSoup(driver.page_source, 'html.parser')
-                pdf_link = extract_pdf_link(pdf_soup)
-
-            date_tag = pub.find('span', class_='date')
-            date = date_tag.text.strip() if date_tag else None
-
-            authors_tag = pub.find('span', class_='author')
-            authors = authors_tag.text.strip() if authors_tag else None
-
-            s3_image_url = download_and_upload_file(image_url, 'raw/publication_covers', s3_bucket_name, aws_region, s3) if image_url else "NA"
-            s3_pdf_url = download_and_upload_file(pdf_link, 'raw/publications', s3_bucket_name, aws_region, s3) if pdf_link else "NA"
-
-            all_data.append({
-                'title': title or "NA",
-                'summary': summary or "NA",
-                'date': date or "NA",
-                'authors': authors or "NA",
+            row = {
+                'title': pub['title'] or "NA",
+                'summary': pub['summary'] or "NA",
+                'date': pub['date'] or "NA",
+                'authors': pub['authors'] or "NA",
                 'cover_path': s3_image_url,
                 'publication_path': s3_pdf_url
-            })
+            }
+            if s3_image_url is None or s3_pdf_url is None:
+                # Leave the publication out of the delta so its stored links are not nulled, keep
+                # the previous entry so the next run retries it, and make sure paging reaches it
+                failed += 1
+                if pub['href']:
+                    new_state[pub['href']] = {**state.get(pub['href'], {'title': pub['title']}), 'retry': True}
+                continue
+            all_data.append(row)
+            if pub['href']:
+                new_state[pub['href']] = {
+                    'title': pub['title'],
+                    'content_hash': pub['content_hash'],
+                    'pdf_link': pub['pdf_link'],
+                    'etag': pub.get('etag'),
+                    'last_modified': pub.get('last_modified'),
+                    'scraped_at': datetime.utcnow().isoformat(),
+                    'row': row
+                }
+    print(f"Transferred files for {len(publications)} publications in {time.perf_counter() - start:.1f}s"
+          f" ({failed} to be retried next run)")
 
-    driver.quit()
     print("Scraping process complete. Creating DataFrame...")
-    df = pd.DataFrame(all_data)
+    df = pd.DataFrame(all_data, columns=CSV_COLUMNS)
     print("DataFrame created.")
     
-    # Push the DataFrame to XCom for the next task
+    # Push the delta and the new state to XCom for the next task; the state is only
+    # saved once the CSVs are uploaded, so a failed run is retried from the old state
     kwargs['ti'].xcom_push(key='scraped_data', value=df.to_json(orient='records'))
+    kwargs['ti'].xcom_push(key='scrape_state', value=new_state)
 
 # Function to save the scraped data as a CSV file and upload to S3
 def save_and_upload_csv(**kwargs):
@@ -143,13 +207,31 @@ def save_and_upload_csv(**kwargs):
 
     # Pull the data from XCom
     data_json = kwargs['ti'].xcom_pull(task_ids='scrape_publications_task', key='scraped_data')
-    df = pd.read_json(data_json)
+    state = kwargs['ti'].xcom_pull(task_ids='scrape_publications_task', key='scrape_state')
+    df = pd.DataFrame(json.loads(data_json), columns=CSV_COLUMNS)
     
-    df.to_csv(csv_buffer, index=False)
+    # The delta holds only new or changed publications. Each run writes its own key, so deltas
+    # from several runs stay pending until the Snowflake load has merged them
+    if len(df):
+        run_id = re.sub(r'[^A-Za-z0-9_.-]', '_', kwargs['run_id'])
+        delta_key = f"{DELTA_CSV_PREFIX}{kwargs['ts_nodash']}_{run_id}.csv"
+        df.to_csv(csv_buffer, index=False)
+        s3.put_object(Body=csv_buffer.getvalue(), Bucket=s3_bucket_name, Key=delta_key)
+        print(f'Delta CSV with {len(df)} publications uploaded to S3 at: s3://{s3_bucket_name}/{delta_key}')
+    else:
+        print("No new or changed publications; no delta CSV written.")
+
+    # The full catalog is rebuilt from the state
+    catalog = pd.DataFrame([entry['row'] for entry in state.values() if entry.get('row')], columns=CSV_COLUMNS)
+    csv_buffer = StringIO()
+    catalog.to_csv(csv_buffer, index=False)
     s3_key = "raw/publications_data.csv"
     s3.put_object(Body=csv_buffer.getvalue(), Bucket=s3_bucket_name, Key=s3_key)
     print(f'CSV uploaded to S3 at: s3://{s3_bucket_name}/{s3_key}')
 
+    s3.put_object(Body=json.dumps(state).encode('utf-8'), Bucket=s3_bucket_name, Key=SCRAPE_STATE_KEY)
+    print(f'Scrape state for {len(state)} publications saved to s3://{s3_bucket_name}/{SCRAPE_STATE_KEY}')
+
 # Define the DAG
 default_args = {
     'owner': 'airflow',
@@ -3,36 +3,111 @@ from airflow import DAG
 from airflow.operators.python import PythonOperator
 from datetime import datetime
 import os
+import time
 import snowflake.connector
+from snowflake.connector.pandas_tools import write_pandas
 import boto3
 import pandas as pd
-from io import StringIO
 from dotenv import load_dotenv
+from common.snowflake_pool import get_pool
 
 # Load environment variables
 load_dotenv()
 
-def load_data_into_snowflake():
-    """Reads CSV from S3 and loads it into Snowflake table using a merge operation."""
-    
-    # Establish Snowflake connection
-    conn = snowflake.connector.connect(
-        user=os.getenv("SNOWFLAKE_USER"),
-        password=os.getenv("SNOWFLAKE_PASSWORD"),
-        account=os.getenv("SNOWFLAKE_ACCOUNT"),
-        warehouse=os.getenv("SNOWFLAKE_WAREHOUSE", "WH_PUBLICATIONS_ETL"),
-        role=os.getenv("SNOWFLAKE_ROLE")
+# Rows parsed, staged and held in memory at a time
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "50000"))
+
+# Pending delta CSVs written by each scrape run, and where they are moved once merged.
+# Set PUBLICATIONS_CSV_KEY to load a single CSV instead, e.g. the full raw/publications_data.csv
+DELTA_CSV_PREFIX = os.getenv("DELTA_CSV_PREFIX", "raw/publications_delta/")
+LOADED_DELTA_PREFIX = os.getenv("LOADED_DELTA_PREFIX", "raw/publications_delta_loaded/")
+PUBLICATIONS_CSV_KEY = os.getenv("PUBLICATIONS_CSV_KEY")
+
+# Columns of the CSV produced by the scraper, mapped to PUBLICATION_LIST columns
+CSV_COLUMNS = {
+    "title": "TITLE",
+    "summary": "BRIEF_SUMMARY",
+    "date": "DATE",
+    "authors": "AUTHOR",
+    "cover_path": "IMAGE_LINK",
+    "publication_path": "PDF_LINK",
+}
+
+def create_staging_table(cursor, staging_table):
+    """Create a session-scoped table to bulk load the CSV into before merging."""
+    cursor.execute(
+        "CREATE OR REPLACE TEMPORARY TABLE IDENTIFIER(%(staging)s) "
+        "(SEQ INTEGER, TITLE VARCHAR, BRIEF_SUMMARY VARCHAR, DATE VARCHAR, AUTHOR VARCHAR, IMAGE_LINK VARCHAR, PDF_LINK VARCHAR)",
+        {"staging": staging_table}
+    )
+
+def stage_dataframe(conn, df, database_name, schema_name, staging_table, offset=0):
+    """Bulk load a DataFrame into the staging table with one PUT and COPY."""
+    df = df[list(CSV_COLUMNS)].rename(columns=CSV_COLUMNS).astype(object)
+    df = df.where(pd.notnull(df), None)  # Replace NaN with None
+    # SEQ keeps the CSV order so duplicates resolve the same way the row-by-row merge did
+    df.insert(0, "SEQ", range(offset, offset + len(df)))
+    success, _, nrows, _ = write_pandas(
+        conn, df, staging_table, database=database_name, schema=schema_name, quote_identifiers=False
     )
-    cursor = conn.cursor()
+    if not success:
+        raise RuntimeError(f"Staging {len(df)} rows into {staging_table} failed.")
+    return nrows
 
+def merge_staging_table(cursor, target_table, staging_table):
+    """Merge every staged row into the target table in a single set-based statement."""
+    # Rows sharing a key would make the MERGE nondeterministic, so the last occurrence wins
+    cursor.execute(
+        """
+        MERGE INTO IDENTIFIER(%(target)s) AS target
+        USING (
+            SELECT TITLE, BRIEF_SUMMARY, DATE, AUTHOR, IMAGE_LINK, PDF_LINK
+            FROM IDENTIFIER(%(staging)s)
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY TITLE, AUTHOR, DATE ORDER BY SEQ DESC) = 1
+        ) AS source
+        ON EQUAL_NULL(target.TITLE, source.TITLE)
+           AND EQUAL_NULL(target.AUTHOR, source.AUTHOR)
+           AND EQUAL_NULL(target.DATE, source.DATE)
+        WHEN MATCHED THEN
+          UPDATE SET target.BRIEF_SUMMARY = source.BRIEF_SUMMARY,
+                     target.IMAGE_LINK = source.IMAGE_LINK,
+                     target.PDF_LINK = source.PDF_LINK
+        WHEN NOT MATCHED THEN
+          INSERT (TITLE, BRIEF_SUMMARY, DATE, AUTHOR, IMAGE_LINK, PDF_LINK, CREATED_DATE)
+          VALUES (source.TITLE, source.BRIEF_SUMMARY, source.DATE, source.AUTHOR, source.IMAGE_LINK, source.PDF_LINK, CURRENT_TIMESTAMP);
+        """,
+        {"target": target_table, "staging": staging_table}
+    )
+    inserted, updated = cursor.fetchone()
+    cursor.execute("DROP TABLE IF EXISTS IDENTIFIER(%(staging)s)", {"staging": staging_table})
+    return inserted, updated
+
+def list_pending_deltas(s3_client, bucket):
+    """List the delta CSVs not yet merged, oldest first, so later runs take precedence."""
+    objects = []
+    for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=DELTA_CSV_PREFIX):
+        objects.extend(obj for obj in page.get('Contents', []) if obj['Key'].endswith('.csv'))
+    return [obj['Key'] for obj in sorted(objects, key=lambda obj: (obj['LastModified'], obj['Key']))]
+
+def archive_deltas(s3_client, bucket, keys):
+    """Move merged delta CSVs out of the pending prefix."""
+    for key in keys:
+        archived_key = f"{LOADED_DELTA_PREFIX}{key[len(DELTA_CSV_PREFIX):]}"
+        s3_client.copy_object(Bucket=bucket, Key=archived_key, CopySource={'Bucket': bucket, 'Key': key})
+        s3_client.delete_object(Bucket=bucket, Key=key)
+        print(f"Archived s3://{bucket}/{key} to {archived_key}")
+
+def load_data_into_snowflake():
+    """Reads CSV from S3, bulk loads it into a staging table and merges it into the Snowflake table."""
+    
     # Set up database, schema, and table details
     database_name = os.getenv("SNOWFLAKE_DATABASE", "RESEARCH_PUBLICATIONS")
     schema_name = os.getenv("SNOWFLAKE_SCHEMA", "RESEARCH_PUBLICATIONS")
     table_name = os.getenv("SNOWFLAKE_TABLE", "PUBLICATION_LIST")
+    staging_name = f"{table_name}_STAGING"
 
     # Set up S3 details
     s3_bucket = os.getenv("S3_BUCKET_NAME")
-    s3_key = "raw/publications_data.csv"
     aws_region = os.getenv("AWS_REGION")
 
     s3_client = boto3.client(
@@ -43,48 +118,62 @@ def load_data_into_snowflake():
     )
 
     def read_csv_from_s3(bucket, key):
-        """Read CSV content from S3 and load it into a pandas DataFrame."""
-        print(f"Reading CSV from S3 bucket '{bucket}', key '{key}'...")
+        """Stream CSV content from S3 as pandas DataFrames of at most CSV_CHUNK_ROWS rows."""
+        print(f"Reading CSV from S3 bucket '{bucket}', key '{key}' in chunks of {CSV_CHUNK_ROWS} rows...")
         response = s3_client.get_object(Bucket=bucket, Key=key)
-        csv_content = response['Body'].read().decode('utf-8')
-        return pd.read_csv(StringIO(csv_content))
+        # Parse straight from the response body, so only one chunk is ever decoded in memory
+        with response['Body'] as body:
+            yield from pd.read_csv(body, chunksize=CSV_CHUNK_ROWS, dtype=str, encoding='utf-8')
 
-    # Load data from S3
-    df = read_csv_from_s3(s3_bucket, s3_key)
-    df = df.where(pd.notnull(df), None)  # Replace NaN with None
+    # Each scrape run's delta holds only its new or changed publications; the MERGE upserts them
+    s3_keys = [PUBLICATIONS_CSV_KEY] if PUBLICATIONS_CSV_KEY else list_pending_deltas(s3_client, s3_bucket)
+    if not s3_keys:
+        print(f"No pending delta CSVs under s3://{s3_bucket}/{DELTA_CSV_PREFIX}; nothing to load.")
+        return
 
+    # Borrow a pooled Snowflake connection; it is discarded if a connector error is raised
+    pool = get_pool(database=None, schema=None)
     try:
-        print("Starting data merge operation in Snowflake...")
-        for _, row in df.iterrows():
-            merge_query = f"""
-            MERGE INTO {database_name}.{schema_name}.{table_name} AS target
-            USING (SELECT '{row['title']}' AS TITLE,
-                         '{row['summary']}' AS BRIEF_SUMMARY,
-                         '{row['date']}' AS DATE,
-                         '{row['authors']}' AS AUTHOR,
-                         '{row['cover_path']}' AS IMAGE_LINK,
-                         '{row['publication_path']}' AS PDF_LINK,
-                         CURRENT_TIMESTAMP AS CREATED_DATE) AS source
-            ON target.TITLE = source.TITLE
-               AND target.AUTHOR = source.AUTHOR
-               AND target.DATE = source.DATE
-            WHEN MATCHED THEN
-              UPDATE SET target.BRIEF_SUMMARY = source.BRIEF_SUMMARY,
-                         target.IMAGE_LINK = source.IMAGE_LINK,
-                         target.PDF_LINK = source.PDF_LINK
-            WHEN NOT MATCHED THEN
-              INSERT (TITLE, BRIEF_SUMMARY, DATE, AUTHOR, IMAGE_LINK, PDF_LINK, CREATED_DATE)
-              VALUES (source.TITLE, source.BRIEF_SUMMARY, source.DATE, source.AUTHOR, source.IMAGE_LINK, source.PDF_LINK, source.CREATED_DATE);
-            """
-            cursor.execute(merge_query)
-        print(f"Data loaded successfully into table '{table_name}'.")
-        
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                print("Starting bulk load and merge operation in Snowflake...")
+                start = time.perf_counter()
+                create_staging_table(cursor, f"{database_name}.{schema_name}.{staging_name}")
+                # Each chunk is staged as soon as it is parsed; the merge runs once over all of them
+                staged = 0
+                for s3_key in s3_keys:
+                    for df in read_csv_from_s3(s3_bucket, s3_key):
+                        # A header-only CSV parses to one empty chunk, which write_pandas cannot stage
+                        if df.empty:
+                            continue
+                        staged += stage_dataframe(conn, df, database_name, schema_name, staging_name, offset=staged)
+                        print(f"Staged {staged} rows so far...")
+                if not staged:
+                    cursor.execute(
+                        "DROP TABLE IF EXISTS IDENTIFIER(%(staging)s)",
+                        {"staging": f"{database_name}.{schema_name}.{staging_name}"}
+                    )
+                    print(f"No publications in {len(s3_keys)} CSV(s); nothing to load.")
+                else:
+                    inserted, updated = merge_staging_table(
+                        cursor, f"{database_name}.{schema_name}.{table_name}", f"{database_name}.{schema_name}.{staging_name}"
+                    )
+                    print(f"Data loaded successfully into table '{table_name}' from {len(s3_keys)} CSV(s): "
+                          f"{staged} rows staged, {inserted} inserted, {updated} updated in {time.perf_counter() - start:.1f}s.")
+            finally:
+                cursor.close()
+
+        # Deltas are only archived once merged; a failed load leaves them pending for the next run
+        if not PUBLICATIONS_CSV_KEY:
+            archive_deltas(s3_client, s3_bucket, s3_keys)
+
     except snowflake.connector.errors.ProgrammingError as e:
+        # Fail the task so the run is retried and the pending deltas are not lost
         print(f"Error during data merge: {e}")
+        raise
     finally:
-        cursor.close()
-        conn.close()
-        print("Snowflake connection closed.")
+        print(f"Snowflake connection released. Pool metrics: {pool.metrics()}")
 
 # Define the DAG for Airflow
 default_args = {
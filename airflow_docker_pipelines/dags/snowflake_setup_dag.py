@@ -5,23 +5,12 @@ from datetime import datetime
 import snowflake.connector
 import os
 from dotenv import load_dotenv
+from common.snowflake_pool import get_pool
 
 # Load environment variables
 load_dotenv()
 
 def snowflake_setup():
-    # Establish a connection to Snowflake using environment variables
-    conn = snowflake.connector.connect(
-        user=os.getenv("SNOWFLAKE_USER"),
-        password=os.getenv("SNOWFLAKE_PASSWORD"),
-        account=os.getenv("SNOWFLAKE_ACCOUNT"),
-        warehouse=os.getenv("SNOWFLAKE_WAREHOUSE", "WH_PUBLICATIONS_ETL"),
-        role=os.getenv("SNOWFLAKE_ROLE")
-    )
-
-    # Create a cursor
-    cursor = conn.cursor()
-
     # Get the database, schema, and table names from environment variables, or use default values
     database_name = os.getenv("SNOWFLAKE_DATABASE", "RESEARCH_PUBLICATIONS")
     schema_name = os.getenv("SNOWFLAKE_SCHEMA", "RESEARCH_PUBLICATIONS")
@@ -63,39 +52,46 @@ def snowflake_setup():
     );
     """
 
+    # Borrow a pooled Snowflake connection; the database may not exist yet.
+    # A connection that raised a connector error is discarded rather than reused.
+    pool = get_pool(database=None, schema=None)
     try:
-        # Execute each statement separately
-        print(f"Creating warehouse '{warehouse_name}' if not already exists...")
-        cursor.execute(create_warehouse_script)
-        print(f"Warehouse '{warehouse_name}' successfully created or confirmed to already exist.")
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # Execute each statement separately
+                print(f"Creating warehouse '{warehouse_name}' if not already exists...")
+                cursor.execute(create_warehouse_script)
+                print(f"Warehouse '{warehouse_name}' successfully created or confirmed to already exist.")
+
+                print(f"Creating database '{database_name}' if not already exists...")
+                cursor.execute(create_database_script)
+                print(f"Database '{database_name}' successfully created or confirmed to already exist.")
 
-        print(f"Creating database '{database_name}' if not already exists...")
-        cursor.execute(create_database_script)
-        print(f"Database '{database_name}' successfully created or confirmed to already exist.")
+                print(f"Switching to database '{database_name}'...")
+                cursor.execute(use_database_script)
+                print(f"Successfully switched to database '{database_name}'.")
 
-        print(f"Switching to database '{database_name}'...")
-        cursor.execute(use_database_script)
-        print(f"Successfully switched to database '{database_name}'.")
+                print(f"Creating schema '{schema_name}' if not already exists...")
+                cursor.execute(create_schema_script)
+                print(f"Schema '{schema_name}' successfully created or confirmed to already exist.")
 
-        print(f"Creating schema '{schema_name}' if not already exists...")
-        cursor.execute(create_schema_script)
-        print(f"Schema '{schema_name}' successfully created or confirmed to already exist.")
+                print(f"Switching to schema '{schema_name}'...")
+                cursor.execute(use_schema_script)
+                print(f"Successfully switched to schema '{schema_name}'.")
 
-        print(f"Switching to schema '{schema_name}'...")
-        cursor.execute(use_schema_script)
-        print(f"Successfully switched to schema '{schema_name}'.")
+                print(f"Dropping and recreating the '{table_name}' table...")
+                cursor.execute(create_table_script)
+                print(f"Table '{table_name}' successfully created or replaced.")
 
-        print(f"Dropping and recreating the '{table_name}' table...")
-        cursor.execute(create_table_script)
-        print(f"Table '{table_name}' successfully created or replaced.")
+            finally:
+                cursor.close()
 
     except snowflake.connector.errors.ProgrammingError as e:
         print(f"Error during setup: {e}")
 
     finally:
-        cursor.close()
-        conn.close()
-        print("Snowflake connection closed.")
+        print(f"Snowflake connection released. Pool metrics: {pool.metrics()}")
 
 # Define the DAG for Airflow
 default_args = {
@@ -43,12 +43,12 @@ def route(state):
             elif tool_name == "RAGQuery":
                 query = ai_message.tool_calls[0]["args"].get("query")
                 publication_id = ai_message.tool_calls[0]["args"].get("publication_id")
-                if query and publication_id:
+                if query:
                     state["query"] = query
                     state["publication_id"] = publication_id
                     return "rag_agent"
                 else:
-                    print("Error: query or publication_id missing in RAGQuery tool call.")
+                    print("Error: query missing in RAGQuery tool call.")
                     return END  # Handle this as an error case if values are missing
             elif tool_name == "Search":
                 return "search_node"
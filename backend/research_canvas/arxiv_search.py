@@ -3,7 +3,10 @@
 The arxiv_search node is responsible for searching Arxiv for research papers.
 """
 
+import asyncio
 import os
+import re
+import time
 from typing import cast, List
 from pydantic import BaseModel, Field
 from langchain_core.runnables import RunnableConfig
@@ -12,6 +15,7 @@ from langchain.tools import tool
 from copilotkit.langchain import copilotkit_emit_state, copilotkit_customize_config
 from research_canvas.state import AgentState
 from research_canvas.model import get_model
+from research_canvas.ttl_cache import TTLCache
 import arxiv
 
 class ArxivResourceInput(BaseModel):
@@ -24,6 +28,78 @@ class ArxivResourceInput(BaseModel):
 def ExtractArxivResources(resources: List[ArxivResourceInput]):  # pylint: disable=invalid-name,unused-argument
     """Extract the 3-5 most relevant papers from an Arxiv search result."""
 
+ARXIV_MAX_RESULTS = 5
+# arXiv asks API clients to wait at least 3 seconds between requests
+ARXIV_MIN_INTERVAL = float(os.getenv("ARXIV_MIN_INTERVAL", "3"))
+ARXIV_CACHE_TTL = float(os.getenv("ARXIV_CACHE_TTL", str(6 * 3600)))
+
+# Queries are paced below; the client keeps its own delay so its retries are paced too
+arxiv_client = arxiv.Client(page_size=ARXIV_MAX_RESULTS, delay_seconds=ARXIV_MIN_INTERVAL, num_retries=3)
+
+# Normalized query -> list of arXiv IDs, and arXiv ID -> paper metadata
+_query_cache = TTLCache(maxsize=512, ttl=ARXIV_CACHE_TTL)
+_paper_cache = TTLCache(maxsize=4096, ttl=ARXIV_CACHE_TTL)
+
+_pacing_lock = asyncio.Lock()
+_last_request = 0.0
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def _arxiv_id(result: arxiv.Result) -> str:
+    """Get the arXiv ID of a result without its version suffix."""
+    return re.sub(r"v\d+$", "", result.get_short_id())
+
+def _fetch_papers(query: str) -> List[dict]:
+    """Run an Arxiv search synchronously. Runs in a worker thread."""
+    search = arxiv.Search(
+        query=query,
+        max_results=ARXIV_MAX_RESULTS,
+        sort_by=arxiv.SortCriterion.Relevance
+    )
+    return [
+        {
+            "id": _arxiv_id(result),
+            "title": result.title,
+            "url": result.pdf_url,
+            "description": result.summary
+        } for result in arxiv_client.results(search)
+    ]
+
+async def _search_arxiv(query: str) -> List[dict]:
+    """
+    Search Arxiv for a query, returning paper metadata.
+    Cached queries never touch the network; others are paced to respect arXiv's rate limit.
+    """
+    global _last_request # pylint: disable=global-statement
+    key = _normalize_query(query)
+    paper_ids = _query_cache.get(key)
+    if paper_ids is not None:
+        papers = [_paper_cache.get(paper_id) for paper_id in paper_ids]
+        if all(papers):
+            print(f"Arxiv cache hit for query: {query}")
+            return papers
+
+    async with _pacing_lock:
+        wait = _last_request + ARXIV_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        _last_request = time.monotonic()
+
+    print(f"Executing Arxiv search with query: {query}")
+    papers = await asyncio.to_thread(_fetch_papers, query)
+    for paper in papers:
+        _paper_cache.set(paper["id"], paper)
+    _query_cache.set(key, [paper["id"] for paper in papers])
+    return papers
+
+async def _search_arxiv_indexed(i: int, query: str):
+    try:
+        return i, await _search_arxiv(query), None
+    except Exception as e: # pylint: disable=broad-except
+        print(f"An unexpected error occurred during Arxiv search for query '{query}': {e}")
+        return i, [], f"Unexpected error: {str(e)}"
+
 async def arxiv_search_node(state: AgentState, config: RunnableConfig):
     """
     The arxiv_search node is responsible for searching Arxiv for research papers.
@@ -34,6 +110,8 @@ async def arxiv_search_node(state: AgentState, config: RunnableConfig):
     state["logs"] = state.get("logs", [])
     queries = ai_message.tool_calls[0]["args"]["queries"]
 
+    logs_offset = len(state["logs"])
+
     for query in queries:
         state["logs"].append({
             "message": f"Searching Arxiv for papers related to '{query}'",
@@ -43,30 +121,26 @@ async def arxiv_search_node(state: AgentState, config: RunnableConfig):
     await copilotkit_emit_state(config, state)
 
     arxiv_results = []
-
-    for i, query in enumerate(queries):
-        try:
-            print(f"Executing Arxiv search with query: {query}")
-            search = arxiv.Search(
-                query=query,
-                max_results=5,
-                sort_by=arxiv.SortCriterion.Relevance
-            )
-            results = [
-                {
-                    "title": result.title,
-                    "url": result.pdf_url,
-                    "description": result.summary
-                } for result in search.results()
-            ]
-            arxiv_results.extend(results)
-            state["logs"][i]["done"] = True
-            await copilotkit_emit_state(config, state)
-        except Exception as e:
-            print(f"An unexpected error occurred during Arxiv search for query '{query}': {e}")
-            state["logs"][i]["message"] = f"Unexpected error: {str(e)}"
-            state["logs"][i]["done"] = True
-            await copilotkit_emit_state(config, state)
+    seen_ids = set()
+
+    # Run the queries concurrently and update the UI as each one completes
+    for finished in asyncio.as_completed([
+        _search_arxiv_indexed(i, query) for i, query in enumerate(queries)
+    ]):
+        i, papers, error = await finished
+        if error is not None:
+            state["logs"][logs_offset + i]["message"] = error
+        for paper in papers:
+            if paper["id"] in seen_ids:
+                continue
+            seen_ids.add(paper["id"])
+            arxiv_results.append({
+                "title": paper["title"],
+                "url": paper["url"],
+                "description": paper["description"]
+            })
+        state["logs"][logs_offset + i]["done"] = True
+        await copilotkit_emit_state(config, state)
 
     config = copilotkit_customize_config(
         config,
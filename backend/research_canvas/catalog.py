@@ -0,0 +1,142 @@
+#catalog.py
+"""
+This module keeps the publication catalog in memory and hands out presigned URLs.
+
+The PUBLICATION_LIST table is reloaded from Snowflake when its TTL lapses or the
+catalog is invalidated. Presigned URLs are generated per document on first use
+and reused until shortly before they expire.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import boto3
+from dotenv import load_dotenv
+from botocore.config import Config
+from research_canvas.snowflake_pool import get_pool
+
+# Load environment variables
+load_dotenv()
+
+# Initialize S3 client with signature version 's3v4'
+s3_client = boto3.client(
+    's3',
+    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+    region_name=os.getenv("AWS_REGION"),
+    config=Config(signature_version='s3v4')
+)
+
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "300"))
+PRESIGNED_URL_EXPIRES_IN = int(os.getenv("PRESIGNED_URL_EXPIRES_IN", "3600"))
+# Presigned URLs are regenerated this many seconds before they expire
+PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv("PRESIGNED_URL_REFRESH_MARGIN", "300"))
+
+def extract_bucket_and_key(s3_url):
+    """Extract bucket name and key from an S3 URL."""
+    match = re.match(r'https://(.+?)\.s3\..*?\.amazonaws\.com/(.+)', s3_url)
+    if match:
+        bucket = match.group(1)
+        key = match.group(2)
+        return bucket, key
+    else:
+        raise ValueError("Invalid S3 URL format")
+
+class PublicationCatalog:
+    """
+    An in-memory copy of the publication catalog with lazily presigned PDF links.
+    """
+
+    def __init__(
+        self,
+        ttl: float = CATALOG_TTL,
+        expires_in: int = PRESIGNED_URL_EXPIRES_IN,
+        refresh_margin: int = PRESIGNED_URL_REFRESH_MARGIN
+    ):
+        self.ttl = ttl
+        self.expires_in = expires_in
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        # id -> (title, bucket, key)
+        self._publications: Dict[int, Tuple[str, str, str]] = {}
+        # id -> (presigned url, time after which it must be regenerated)
+        self._urls: Dict[int, Tuple[str, float]] = {}
+        self._document_list: Optional[List[dict]] = None
+        self._document_list_valid_until = 0.0
+
+    def _fetch(self) -> Dict[int, Tuple[str, str, str]]:
+        with get_pool().connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT id, title, pdf_link FROM PUBLICATION_LIST;")
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+
+        publications = {}
+        for publication_id, title, pdf_link in rows:
+            try:
+                bucket, key = extract_bucket_and_key(pdf_link)
+            except (TypeError, ValueError):
+                print(f"Skipping publication {publication_id} with invalid PDF link: {pdf_link}")
+                continue
+            publications[publication_id] = (title, bucket, key)
+        return publications
+
+    def _refresh_if_stale(self):
+        if time.monotonic() - self._loaded_at < self.ttl:
+            return
+        publications = self._fetch()
+        # Keep presigned URLs for documents whose S3 location is unchanged
+        self._urls = {
+            publication_id: url for publication_id, url in self._urls.items()
+            if publication_id in publications
+            and publications[publication_id][1:] == self._publications[publication_id][1:]
+        }
+        self._publications = publications
+        self._loaded_at = time.monotonic()
+        self._document_list = None
+        print(f"Publication catalog loaded with {len(publications)} documents.")
+
+    def invalidate(self):
+        """
+        Force the catalog to be reloaded on next use.
+        """
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _presigned_url(self, publication_id: int) -> str:
+        cached = self._urls.get(publication_id)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        _, bucket, key = self._publications[publication_id]
+        url = s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': bucket, 'Key': key},
+            ExpiresIn=self.expires_in
+        )
+        self._urls[publication_id] = (url, time.monotonic() + self.expires_in - self.refresh_margin)
+        return url
+
+    def document_list(self) -> List[dict]:
+        """
+        Get the documents with presigned links. The list is reused until the
+        catalog is reloaded or its earliest link is due for regeneration.
+        """
+        with self._lock:
+            self._refresh_if_stale()
+            if self._document_list is None or time.monotonic() >= self._document_list_valid_until:
+                self._document_list = [
+                    {"id": publication_id, "title": title, "pdf_link": self._presigned_url(publication_id)}
+                    for publication_id, (title, _, _) in self._publications.items()
+                ]
+                self._document_list_valid_until = min(
+                    (self._urls[publication_id][1] for publication_id in self._publications),
+                    default=time.monotonic() + self.ttl
+                )
+            return list(self._document_list)
+
+catalog = PublicationCatalog()
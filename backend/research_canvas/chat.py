@@ -1,7 +1,8 @@
 # chat.py
 """Chat Node"""
 
-from typing import List, cast
+import asyncio
+from typing import List, Optional, cast
 from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import SystemMessage, AIMessage, ToolMessage
 from langchain.tools import tool
@@ -9,10 +10,12 @@ from copilotkit.langchain import copilotkit_customize_config
 from research_canvas.state import AgentState
 from research_canvas.model import get_model
 from research_canvas.download import get_resource
+from research_canvas.context import pack_resources
 
 @tool
-def Search(queries: List[str]):  # pylint: disable=invalid-name,unused-argument
-    """A list of one or more search queries to find good resources to support the research."""
+def Search(queries: List[str], bypass_cache: bool = False):  # pylint: disable=invalid-name,unused-argument
+    """A list of one or more search queries to find good resources to support the research.
+    Set bypass_cache only when the user asks for fresh or up-to-the-minute results."""
 
 @tool
 def ArxivSearch(queries: List[str]):  # pylint: disable=invalid-name,unused-argument
@@ -35,8 +38,9 @@ def DocumentSelection():  # Tool for document selection
     """Retrieve available documents for research with presigned URLs."""
 
 @tool
-def RAGQuery(query: str, publication_id: int):  # Tool for RAG-based document querying
-    """Retrieve information based on the content of a specific document."""
+def RAGQuery(query: str, publication_id: Optional[int] = None):  # Tool for RAG-based document querying
+    """Retrieve information based on the content of a specific document.
+    Omit publication_id to search across all preprocessed documents."""
 
 async def chat_node(state: AgentState, config: RunnableConfig):
     """
@@ -60,10 +64,16 @@ async def chat_node(state: AgentState, config: RunnableConfig):
 
     resources = []
     for resource in state["resources"]:
-        content = get_resource(resource["url"])
+        content = await get_resource(resource["url"])
         if content != "ERROR":
             resources.append({**resource, "content": content})
 
+    # Pack the most relevant parts of each resource into the prompt budget; chunking,
+    # tokenizing and hashing large pages is CPU work, so it runs off the event loop
+    last_content = state["messages"][-1].content if state["messages"] else ""
+    query = " ".join([research_question, report, last_content if isinstance(last_content, str) else ""])
+    resources_context = await asyncio.to_thread(pack_resources, resources, query)
+
     model = get_model(state)
     ainvoke_kwargs = {}
     if model.__class__.__name__ == "ChatOpenAI":
@@ -104,7 +114,7 @@ async def chat_node(state: AgentState, config: RunnableConfig):
 
             Guidelines:
             - **Document Selection**: If preprocessed publications are unavailable in the state, use `DocumentSelection` to retrieve them. Once selected, remember the document ID for further queries.
-            - **RAGQuery (Retrieval-Augmented Generation)**: Use `RAGQuery` to answer questions about a specific document. Ensure the response indicates that content is based on the selected document's context.
+            - **RAGQuery (Retrieval-Augmented Generation)**: Use `RAGQuery` to answer questions about a specific document, or omit the publication ID to search across all documents. Ensure the response indicates that content is based on the retrieved documents' context.
             - **Arxiv Search**: For academic research papers, use `ArxivSearch` to find relevant resources on Arxiv.
             - **Web Search**: For general research beyond selected documents, use the `Search` tool to gather additional resources online.
             - **Report Writing**: Use `WriteReport` for adding content to the report. Only use this tool to add information to the report; avoid direct responses with report text. Engage the user by suggesting next steps or areas for improvement.
@@ -116,7 +126,7 @@ async def chat_node(state: AgentState, config: RunnableConfig):
             {report}
 
             Available resources (URLs and content):
-            {resources}
+            {resources_context}
 
             Preprocessed documents for selection:
             {documents_display}
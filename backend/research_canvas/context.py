@@ -0,0 +1,154 @@
+#context.py
+"""
+This module packs resource content into the chat prompt under a token budget.
+
+Each resource is split into chunks once, and the chunks and their token counts
+are cached. On every turn the chunks most relevant to the current question and
+report are selected until the budget is spent.
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CHUNK_TOKENS = int(os.getenv("CONTEXT_CHUNK_TOKENS", "300"))
+_MAX_CACHED_RESOURCES = 256
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Chunks with (text, token count, term counts), keyed by URL and content hash
+_CHUNK_CACHE: "OrderedDict[Tuple[str, str], List[Tuple[str, int, Counter]]]" = OrderedDict()
+# pack_resources runs in worker threads, so concurrent chat turns share the cache
+_chunk_cache_lock = threading.Lock()
+
+_token_counter: Optional[Callable[[str], int]] = None
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with tiktoken when available, else estimate from length.
+    """
+    global _token_counter # pylint: disable=global-statement
+    if _token_counter is None:
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding("cl100k_base")
+            _token_counter = lambda value: len(encoding.encode(value, disallowed_special=()))
+        except Exception: # pylint: disable=broad-except
+            _token_counter = lambda value: math.ceil(len(value) / 4)
+    return _token_counter(text)
+
+def _terms(text: str) -> Counter:
+    return Counter(_WORD_RE.findall(text.lower()))
+
+def _paragraphs(content: str) -> List[str]:
+    """
+    Split markdown into paragraphs, breaking oversized ones into word windows.
+    """
+    window = max(CHUNK_TOKENS * 3 // 4, 1)
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", content):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        words = paragraph.split()
+        if len(words) <= window:
+            paragraphs.append(paragraph)
+            continue
+        paragraphs.extend(" ".join(words[i:i + window]) for i in range(0, len(words), window))
+    return paragraphs
+
+def _split(content: str) -> List[str]:
+    """
+    Split markdown into paragraph-aligned chunks of roughly CHUNK_TOKENS tokens.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph in _paragraphs(content):
+        tokens = count_tokens(paragraph)
+        if current and current_tokens + tokens > CHUNK_TOKENS:
+            chunks.append("\n\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(paragraph)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def _get_chunks(url: str, content: str) -> List[Tuple[str, int, Counter]]:
+    key = (url, hashlib.sha1(content.encode("utf-8")).hexdigest())
+    with _chunk_cache_lock:
+        chunks = _CHUNK_CACHE.get(key)
+        if chunks is not None:
+            _CHUNK_CACHE.move_to_end(key)
+            return chunks
+    chunks = [(text, count_tokens(text), _terms(text)) for text in _split(content)]
+    with _chunk_cache_lock:
+        _CHUNK_CACHE[key] = chunks
+        while len(_CHUNK_CACHE) > _MAX_CACHED_RESOURCES:
+            _CHUNK_CACHE.popitem(last=False)
+    return chunks
+
+def _score(query_terms: Counter, chunk_terms: Counter, idf: Dict[str, float]) -> float:
+    if not chunk_terms:
+        return 0.0
+    length = sum(chunk_terms.values())
+    score = 0.0
+    for term in query_terms:
+        frequency = chunk_terms.get(term, 0)
+        if frequency:
+            score += idf.get(term, 0.0) * frequency / (frequency + 1.2 * (0.25 + 0.75 * length / 200))
+    return score
+
+def pack_resources(resources: List[dict], query: str, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Render resources for the prompt, keeping only the chunks most relevant to
+    the query that fit within the token budget.
+    """
+    if not resources:
+        return "No resources yet."
+
+    headers = []
+    candidates = []
+    for r_index, resource in enumerate(resources):
+        header = f"### {resource.get('title', '')}\nURL: {resource['url']}\n{resource.get('description', '')}"
+        headers.append(header)
+        for c_index, chunk in enumerate(_get_chunks(resource["url"], resource.get("content", ""))):
+            candidates.append((r_index, c_index, chunk))
+
+    remaining = budget - sum(count_tokens(header) for header in headers)
+
+    query_terms = _terms(query)
+    document_frequency = Counter()
+    for _, _, (_, _, terms) in candidates:
+        document_frequency.update(terms.keys())
+    total = max(len(candidates), 1)
+    idf = {
+        term: math.log(1 + (total - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        for term in query_terms
+    }
+
+    ranked = sorted(
+        candidates,
+        key=lambda candidate: (_score(query_terms, candidate[2][2], idf), -candidate[1]),
+        reverse=True
+    )
+
+    selected = {}
+    for r_index, c_index, (text, tokens, _) in ranked:
+        if tokens > remaining:
+            continue
+        selected.setdefault(r_index, []).append((c_index, text))
+        remaining -= tokens
+
+    sections = []
+    for r_index, header in enumerate(headers):
+        chunks = [text for _, text in sorted(selected.get(r_index, []))]
+        sections.append("\n\n".join([header, *chunks]))
+    return "\n\n".join(sections)
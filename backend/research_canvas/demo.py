@@ -13,6 +13,9 @@ from copilotkit import CopilotKitSDK, LangGraphAgent
 from copilotkit.langchain import copilotkit_messages_to_langchain
 from research_canvas.agent import graph
 from research_canvas.export_router import router as export_router 
+from research_canvas.downloader import close_session
+from research_canvas.download import shutdown_converter_pool
+from research_canvas.snowflake_pool import close_all_pools
 
 app = FastAPI()
 sdk = CopilotKitSDK(
@@ -44,6 +47,13 @@ def health():
     """Health check."""
     return {"status": "ok"}
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Release pooled connections."""
+    await close_session()
+    shutdown_converter_pool()
+    close_all_pools()
+
 
 def main():
     """Run the uvicorn server."""
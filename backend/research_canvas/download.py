@@ -3,41 +3,93 @@
 This module contains the implementation of the download_node function.
 """
 
-import aiohttp
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
 import html2text
 from copilotkit.langchain import copilotkit_emit_state
 from langchain_core.runnables import RunnableConfig
 from research_canvas.state import AgentState
+from research_canvas.downloader import fetch_text_capped
+from research_canvas.resource_cache import resource_cache
 
-_RESOURCE_CACHE = {}
+# Pages larger than this are truncated before conversion
+MAX_HTML_BYTES = int(os.getenv("MAX_HTML_BYTES", str(2 * 1024 * 1024)))
+CONVERT_WORKERS = int(os.getenv("HTML_CONVERT_WORKERS", "2"))
+CONVERT_EXECUTOR = os.getenv("HTML_CONVERT_EXECUTOR", "process")
 
-def get_resource(url: str):
+_converter_pool: Optional[Executor] = None
+
+# Recent conversions, used to see which pages cost the most
+_CONVERSION_STATS = deque(maxlen=200)
+
+async def get_resource(url: str):
     """
     Get a resource from the cache.
     """
-    return _RESOURCE_CACHE.get(url, "")
+    return await resource_cache.aget(url)
 
+def _get_converter_pool() -> Executor:
+    global _converter_pool # pylint: disable=global-statement
+    if _converter_pool is None:
+        if CONVERT_EXECUTOR == "thread":
+            _converter_pool = ThreadPoolExecutor(max_workers=CONVERT_WORKERS)
+        else:
+            # Forking a process that runs an event loop and open sessions is unsafe, so spawn
+            _converter_pool = ProcessPoolExecutor(
+                max_workers=CONVERT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _converter_pool
 
-_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3" # pylint: disable=line-too-long
+def shutdown_converter_pool():
+    """
+    Shut down the HTML conversion pool. Called on application shutdown.
+    """
+    global _converter_pool # pylint: disable=global-statement
+    if _converter_pool is not None:
+        _converter_pool.shutdown(wait=False, cancel_futures=True)
+        _converter_pool = None
+
+def _convert_html(html_content: str) -> Tuple[str, float]:
+    """
+    Convert HTML to markdown. Runs in the converter pool.
+    """
+    start = time.perf_counter()
+    markdown_content = html2text.html2text(html_content)
+    return markdown_content, time.perf_counter() - start
+
+def get_conversion_stats() -> List[dict]:
+    """
+    Get recent conversion stats, most expensive first.
+    """
+    return sorted(_CONVERSION_STATS, key=lambda stat: stat["seconds"], reverse=True)
 
 async def _download_resource(url: str):
     """
     Download a resource from the internet asynchronously.
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url,
-                headers={"User-Agent": _USER_AGENT},
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                response.raise_for_status()
-                html_content = await response.text()
-                markdown_content = html2text.html2text(html_content)
-                _RESOURCE_CACHE[url] = markdown_content
-                return markdown_content
+        html_content, truncated = await fetch_text_capped(url, MAX_HTML_BYTES)
+        loop = asyncio.get_running_loop()
+        markdown_content, seconds = await loop.run_in_executor(
+            _get_converter_pool(), _convert_html, html_content
+        )
+        _CONVERSION_STATS.append({
+            "url": url,
+            "input_bytes": len(html_content),
+            "truncated": truncated,
+            "seconds": seconds
+        })
+        print(f"Converted {url}: {len(html_content)} chars in {seconds:.3f}s{' (truncated)' if truncated else ''}")
+        await resource_cache.aput(url, markdown_content)
+        return markdown_content
     except Exception as e: # pylint: disable=broad-except
-        _RESOURCE_CACHE[url] = "ERROR"
+        await resource_cache.aput_error(url)
         return f"Error downloading resource: {e}"
 
 async def download_node(state: AgentState, config: RunnableConfig):
@@ -52,7 +104,7 @@ async def download_node(state: AgentState, config: RunnableConfig):
 
     # Find resources that are not downloaded
     for resource in state["resources"]:
-        if not get_resource(resource["url"]):
+        if not await get_resource(resource["url"]):
             resources_to_download.append(resource)
             state["logs"].append({
                 "message": f"Downloading {resource['url']}",
@@ -62,9 +114,16 @@ async def download_node(state: AgentState, config: RunnableConfig):
     # Emit the state to let the UI update
     await copilotkit_emit_state(config, state)
 
-    # Download the resources
-    for i, resource in enumerate(resources_to_download):
-        await _download_resource(resource["url"])
+    async def _download_indexed(i: int, url: str):
+        await _download_resource(url)
+        return i
+
+    # Download the resources concurrently, updating the UI as each one finishes
+    for finished in asyncio.as_completed([
+        _download_indexed(i, resource["url"])
+        for i, resource in enumerate(resources_to_download)
+    ]):
+        i = await finished
         state["logs"][logs_offset + i]["done"] = True
 
         # update UI
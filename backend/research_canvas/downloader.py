@@ -0,0 +1,86 @@
+#downloader.py
+"""
+This module provides a shared, connection-pooled HTTP session for downloading resources.
+"""
+
+import asyncio
+import os
+from typing import Optional, Tuple
+import aiohttp
+
+_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3" # pylint: disable=line-too-long
+
+# Global and per-host connection limits for the pooled session
+MAX_CONNECTIONS = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS", "20"))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS_PER_HOST", "4"))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "10"))
+_READ_CHUNK_SIZE = 64 * 1024
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _discard_session(session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]):
+    """Release a session bound to a previous event loop."""
+    if session.closed:
+        return
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+        return
+    # The old loop can no longer run the close coroutine, so close the pooled connections directly
+    connector = session.connector
+    session.detach()
+    if connector is not None:
+        connector.close()
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Get the process-wide pooled session, creating it on first use.
+    The session is bound to the running event loop, so a new one is created
+    if the loop has changed (e.g. when the graph is run with asyncio.run).
+    """
+    global _session, _session_loop # pylint: disable=global-statement
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        if _session is not None:
+            _discard_session(_session, _session_loop)
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONNECTIONS,
+            limit_per_host=MAX_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=300
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": _USER_AGENT},
+            timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+        )
+        _session_loop = loop
+    return _session
+
+async def close_session():
+    """
+    Close the pooled session. Called on application shutdown.
+    """
+    global _session, _session_loop # pylint: disable=global-statement
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+async def fetch_text_capped(url: str, max_bytes: int) -> Tuple[str, bool]:
+    """
+    Stream a URL through the pooled session, stopping after max_bytes.
+    Returns the decoded body and whether it was truncated.
+    """
+    session = get_session()
+    async with session.get(url) as response:
+        response.raise_for_status()
+        body = bytearray()
+        truncated = False
+        async for chunk in response.content.iter_chunked(_READ_CHUNK_SIZE):
+            body.extend(chunk)
+            if len(body) >= max_bytes:
+                truncated = len(body) > max_bytes or not response.content.at_eof()
+                del body[max_bytes:]
+                break
+        encoding = response.charset or "utf-8"
+        return body.decode(encoding, errors="replace"), truncated
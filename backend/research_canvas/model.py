@@ -1,12 +1,43 @@
 #model.py
 """
 This module provides a function to get a model based on the configuration.
+
+Models are kept in a process-wide registry keyed on provider, model name and
+parameters, so repeated calls reuse the same client and its HTTP connection pool.
 """
+import importlib
 import os
-from typing import cast, Any
+import threading
+from typing import cast, Any, Dict, Tuple
 from langchain_core.language_models.chat_models import BaseChatModel
 from research_canvas.state import AgentState
 
+# provider -> (module, class name, model name keyword, model name, parameters)
+_PROVIDERS = {
+    "openai": ("langchain_openai", "ChatOpenAI", "model", "gpt-4o-mini", {"temperature": 0}),
+    "anthropic": (
+        "langchain_anthropic", "ChatAnthropic", "model_name", "claude-3-5-sonnet-20240620",
+        {"temperature": 0, "timeout": None, "stop": None}
+    ),
+    "google_genai": (
+        "langchain_google_genai", "ChatGoogleGenerativeAI", "model", "gemini-1.5-pro", {"temperature": 0}
+    ),
+}
+
+_MODEL_CLASSES: Dict[str, type] = {}
+_MODELS: Dict[Tuple, BaseChatModel] = {}
+_STATS: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+def _get_model_class(provider: str) -> type:
+    """
+    Import a provider SDK once and return its chat model class.
+    """
+    if provider not in _MODEL_CLASSES:
+        module_name, class_name = _PROVIDERS[provider][:2]
+        _MODEL_CLASSES[provider] = getattr(importlib.import_module(module_name), class_name)
+    return _MODEL_CLASSES[provider]
+
 def get_model(state: AgentState) -> BaseChatModel:
     """
     Get a model based on the environment variable.
@@ -17,23 +48,29 @@ def get_model(state: AgentState) -> BaseChatModel:
 
     print(f"Using model: {model}")
 
-    if model == "openai":
-        from langchain_openai import ChatOpenAI
-        return ChatOpenAI(temperature=0, model="gpt-4o-mini")
-    if model == "anthropic":
-        from langchain_anthropic import ChatAnthropic
-        return ChatAnthropic(
-            temperature=0,
-            model_name="claude-3-5-sonnet-20240620",
-            timeout=None,
-            stop=None
-        )
+    if model not in _PROVIDERS:
+        raise ValueError("Invalid model specified")
+
+    _, _, name_keyword, model_name, params = _PROVIDERS[model]
+    params = dict(params)
     if model == "google_genai":
-        from langchain_google_genai import ChatGoogleGenerativeAI
-        return ChatGoogleGenerativeAI(
-            temperature=0,
-            model="gemini-1.5-pro",
-            api_key=cast(Any, os.getenv("GOOGLE_API_KEY")) or None
-        )
-
-    raise ValueError("Invalid model specified")
+        params["api_key"] = cast(Any, os.getenv("GOOGLE_API_KEY")) or None
+
+    key = (model, model_name, tuple(sorted(params.items())))
+    with _lock:
+        stats = _STATS.setdefault(model, {"created": 0, "reused": 0})
+        instance = _MODELS.get(key)
+        if instance is not None:
+            stats["reused"] += 1
+            return instance
+        instance = _get_model_class(model)(**{name_keyword: model_name}, **params)
+        _MODELS[key] = instance
+        stats["created"] += 1
+        return instance
+
+def get_model_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get per-provider counts of created and reused model clients.
+    """
+    with _lock:
+        return {provider: dict(stats) for provider, stats in _STATS.items()}
@@ -0,0 +1,85 @@
+#pinecone_registry.py
+"""
+This module keeps per-process Pinecone index handles and a cached index catalog.
+
+list_indexes() is a control-plane call, so its result is cached for a TTL, and
+Index / PineconeVectorStore objects are built once per index and reused.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Set
+from pinecone import Pinecone as PineconeClient
+from langchain_core.embeddings import Embeddings
+from langchain_pinecone import PineconeVectorStore
+
+INDEX_CATALOG_TTL = float(os.getenv("PINECONE_INDEX_CATALOG_TTL", "300"))
+
+class PineconeIndexRegistry:
+    """
+    Caches Pinecone index names and vector store handles.
+    """
+
+    def __init__(self, client: PineconeClient, embedding: Embeddings, catalog_ttl: float = INDEX_CATALOG_TTL):
+        self.client = client
+        self.embedding = embedding
+        self.catalog_ttl = catalog_ttl
+        self._lock = threading.Lock()
+        self._index_names: Set[str] = set()
+        self._catalog_loaded_at = 0.0
+        self._stores: Dict[str, PineconeVectorStore] = {}
+        self.stats = {"list_indexes_calls": 0, "list_indexes_saved": 0, "handles_created": 0, "handles_reused": 0}
+
+    def _index_catalog(self) -> Set[str]:
+        if time.monotonic() - self._catalog_loaded_at < self.catalog_ttl:
+            self.stats["list_indexes_saved"] += 1
+            return self._index_names
+        self._index_names = set(self.client.list_indexes().names())
+        self._catalog_loaded_at = time.monotonic()
+        self.stats["list_indexes_calls"] += 1
+        return self._index_names
+
+    def invalidate(self):
+        """
+        Force the index catalog to be reloaded and drop cached handles.
+        """
+        with self._lock:
+            self._catalog_loaded_at = 0.0
+            self._stores.clear()
+
+    def index_exists(self, index_name: str) -> bool:
+        """
+        Check whether an index exists, using the cached catalog.
+        A miss triggers one reload in case the index was created recently.
+        """
+        with self._lock:
+            if index_name in self._index_catalog():
+                return True
+            if self._catalog_loaded_at and time.monotonic() - self._catalog_loaded_at < 1:
+                return False
+            self._catalog_loaded_at = 0.0
+            return index_name in self._index_catalog()
+
+    def get_vector_store(self, index_name: str) -> Optional[PineconeVectorStore]:
+        """
+        Get a vector store for an index, or None if the index does not exist.
+        """
+        if not self.index_exists(index_name):
+            return None
+        with self._lock:
+            store = self._stores.get(index_name)
+            if store is not None:
+                self.stats["handles_reused"] += 1
+                return store
+            store = PineconeVectorStore(index=self.client.Index(index_name), embedding=self.embedding)
+            self._stores[index_name] = store
+            self.stats["handles_created"] += 1
+            return store
+
+    def info(self) -> dict:
+        """
+        Return counters, including how many control-plane calls were saved.
+        """
+        with self._lock:
+            return dict(self.stats)
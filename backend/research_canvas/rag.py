@@ -1,58 +1,142 @@
 # rag.py
 
+import asyncio
 import os
+from typing import cast
 from pinecone import Pinecone as PineconeClient
-from langchain_pinecone import PineconeVectorStore
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings
+from copilotkit.langchain import copilotkit_emit_state
 from research_canvas.state import AgentState
+from research_canvas.pinecone_registry import PineconeIndexRegistry
+from research_canvas.embedding_cache import CachedEmbeddings, embedding_cache
+from research_canvas.local_vector_store import HashingEmbeddings, LocalIndexRegistry
 
-# Initialize Pinecone and NVIDIA Embeddings clients
-pc = PineconeClient(api_key=os.getenv('PINECONE_API_KEY'))
-embedding_client = NVIDIAEmbeddings(
-    model="nvidia/nv-embedqa-e5-v5",
-    api_key=os.getenv("NVIDIA_API_KEY"),
-    truncate="END"
-)
+# "pinecone" or "local"; "hashing" embeddings run without a network for development and CI
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "nvidia")
 
-def rag_agent(state: AgentState):
+# Initialize the embeddings client and vector store registry
+if EMBEDDING_BACKEND == "hashing":
+    base_embedding_client = HashingEmbeddings()
+else:
+    base_embedding_client = NVIDIAEmbeddings(
+        model="nvidia/nv-embedqa-e5-v5",
+        api_key=os.getenv("NVIDIA_API_KEY"),
+        truncate="END"
+    )
+embedding_client = CachedEmbeddings(base_embedding_client, embedding_cache)
+
+if VECTOR_STORE_BACKEND == "local":
+    index_registry = LocalIndexRegistry(embedding=embedding_client)
+else:
+    pc = PineconeClient(api_key=os.getenv('PINECONE_API_KEY'))
+    index_registry = PineconeIndexRegistry(pc, embedding_client)
+
+# All publications share one index; chunks carry a publication_id for filtering
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "research-publications")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+
+# Per-stage timeouts, in seconds
+RAG_LOOKUP_TIMEOUT = float(os.getenv("RAG_LOOKUP_TIMEOUT", "10"))
+RAG_EMBED_TIMEOUT = float(os.getenv("RAG_EMBED_TIMEOUT", "15"))
+RAG_QUERY_TIMEOUT = float(os.getenv("RAG_QUERY_TIMEOUT", "15"))
+
+async def _embed_query(query: str):
     """
-    Queries a specific Pinecone index for a document based on publication_id.
+    Embed the query without blocking the event loop.
+    Cached queries return immediately; otherwise Embeddings.aembed_query runs
+    the sync client in an executor unless the client implements it natively.
+    """
+    return await embedding_client.aembed_query(query)
+
+async def rag_agent(state: AgentState, config: RunnableConfig):
+    """
+    Queries the shared Pinecone index, restricted to publication_id when given
+    and across all documents otherwise.
     Updates the state with the RAG query results.
     """
-    # Retrieve query and publication_id from state
+    # Retrieve query and publication_id from state, falling back to the RAGQuery tool call
     query = state.get("query")
     publication_id = state.get("publication_id")
-    
-    if not query or not publication_id:
-        state["rag_query_result"] = {"error": "Missing query or publication ID."}
+    messages = state.get("messages", [])
+    if (not query or not publication_id) and messages and isinstance(messages[-1], AIMessage):
+        tool_calls = cast(AIMessage, messages[-1]).tool_calls
+        if tool_calls and tool_calls[0]["name"] == "RAGQuery":
+            query = query or tool_calls[0]["args"].get("query")
+            publication_id = publication_id or tool_calls[0]["args"].get("publication_id")
+
+    if not query:
+        state["rag_query_result"] = {"error": "Missing query."}
         return state
 
-    index_name = f"pdf-index-{publication_id}"
-    
-    # Check if the index exists
-    if index_name not in pc.list_indexes().names():
-        state["rag_query_result"] = {"error": f"Index {index_name} does not exist in Pinecone."}
+    scope = f"publication {publication_id}" if publication_id else "all publications"
+    search_filter = {"publication_id": {"$eq": publication_id}} if publication_id else None
+
+    state["logs"] = state.get("logs", [])
+    log = {"message": f"Searching {scope} for '{query}'", "done": False}
+    state["logs"].append(log)
+    await copilotkit_emit_state(config, state)
+
+    index_name = PINECONE_INDEX_NAME
+    stage = "index lookup"
+    try:
+        # Get the cached vector store, checking existence against the cached index catalog
+        # (or the local store directory)
+        vector_store = await asyncio.wait_for(
+            asyncio.to_thread(index_registry.get_vector_store, index_name), RAG_LOOKUP_TIMEOUT
+        )
+        if vector_store is None:
+            state["rag_query_result"] = {"error": f"Index {index_name} does not exist in Pinecone."}
+            log["message"] = f"Index {index_name} not found"
+            log["done"] = True
+            await copilotkit_emit_state(config, state)
+            return state
+
+        # Embed the query using the embedding client
+        stage = "embedding"
+        query_embedding = await asyncio.wait_for(_embed_query(query), RAG_EMBED_TIMEOUT)
+        log["message"] = f"Embedded query, retrieving passages from {scope}"
+        await copilotkit_emit_state(config, state)
+
+        # Query Pinecone for similar documents
+        stage = "vector query"
+        response = await asyncio.wait_for(
+            asyncio.to_thread(
+                vector_store.similarity_search_by_vector_with_score,
+                query_embedding, k=RAG_TOP_K, filter=search_filter
+            ),
+            RAG_QUERY_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        print(f"RAG {stage} timed out for {scope}")
+        state["rag_query_result"] = {"error": f"RAG {stage} timed out."}
+        log["message"] = f"RAG {stage} timed out"
+        log["done"] = True
+        await copilotkit_emit_state(config, state)
         return state
-    
-    # Initialize Pinecone index
-    pinecone_index = pc.Index(index_name)
-    
-    # Initialize Pinecone vector store with the embedding client and Pinecone index
-    vector_store = PineconeVectorStore(index=pinecone_index, embedding=embedding_client)
-    
-    # Embed the query using the embedding client
-    query_embedding = embedding_client.embed_query(query)
-    
-    # Query Pinecone for similar documents
-    response = vector_store.similarity_search(query_embedding, top_k=5)
-    
+    except Exception as e: # pylint: disable=broad-except
+        print(f"Error during RAG {stage} for {scope}: {e}")
+        state["rag_query_result"] = {"error": f"RAG {stage} failed: {e}"}
+        log["message"] = f"RAG {stage} failed: {e}"
+        log["done"] = True
+        await copilotkit_emit_state(config, state)
+        return state
+
     # Process the results
-    results = [{"id": match["id"], "text": match["text"], "metadata": match.get("metadata", {})} for match in response]
-    
+    results = [
+        {"id": document.id, "text": document.page_content, "metadata": {**document.metadata, "score": score}}
+        for document, score in response
+    ]
+
     # Update the state with the RAG query result
     state["rag_query_result"] = {
         "publication_id": publication_id,
         "query": query,
         "results": results
     }
+    log["message"] = f"Retrieved {len(results)} passages from {scope}"
+    log["done"] = True
+    await copilotkit_emit_state(config, state)
     return state
@@ -0,0 +1,230 @@
+#resource_cache.py
+"""
+This module provides a bounded cache for downloaded resource content.
+
+Entries live in an in-memory LRU tier bounded by total size and TTL, with an
+optional SQLite tier on disk so content survives restarts and is shared
+between uvicorn workers. Failed downloads are cached for a shorter TTL so
+transient errors are retried. Async callers use aget/aput, which only leave the
+event loop for the disk tier.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+ERROR_MARKER = "ERROR"
+
+class ResourceCache:
+    """
+    A size- and TTL-bounded resource cache with an optional on-disk tier.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 24 * 3600,
+        error_ttl: float = 300,
+        path: Optional[str] = None,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        prune_interval: float = 60
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS resources (
+                        key TEXT PRIMARY KEY,
+                        url TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        size INTEGER NOT NULL
+                    )
+                    """
+                )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _get_memory(self, url: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                content, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(url)
+                    self.stats["hits"] += 1
+                    return content
+                self._remove(url)
+                self.stats["expirations"] += 1
+        return None
+
+    def _get_disk(self, url: str, now: float) -> str:
+        if self.path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT content, expires_at FROM resources WHERE key = ?",
+                    (self._key(url),)
+                ).fetchone()
+            if row and row[1] > now:
+                with self._lock:
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    self._store(url, row[0], row[1])
+                return row[0]
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return ""
+
+    def get(self, url: str) -> str:
+        """
+        Get the content for a URL, or an empty string if it is not cached.
+        """
+        now = time.time()
+        content = self._get_memory(url, now)
+        return content if content is not None else self._get_disk(url, now)
+
+    async def aget(self, url: str) -> str:
+        """
+        Get the content for a URL without blocking the event loop on the disk tier.
+        """
+        now = time.time()
+        content = self._get_memory(url, now)
+        if content is not None:
+            return content
+        if self.path:
+            return await asyncio.to_thread(self._get_disk, url, now)
+        return self._get_disk(url, now)
+
+    def _put_memory(self, url: str, content: str) -> float:
+        ttl = self.error_ttl if content == ERROR_MARKER else self.ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store(url, content, expires_at)
+        return expires_at
+
+    def _put_disk(self, url: str, content: str, expires_at: float):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO resources (key, url, content, expires_at, size) VALUES (?, ?, ?, ?, ?)",
+                (self._key(url), url, content, expires_at, len(content))
+            )
+            # Pruning scans the whole table, so it runs at most once per prune_interval
+            with self._lock:
+                due = time.time() - self._last_prune >= self.prune_interval
+                if due:
+                    self._last_prune = time.time()
+            evicted = self._prune_disk(conn) if due else 0
+        with self._lock:
+            self.stats["evictions"] += evicted
+
+    def put(self, url: str, content: str):
+        """
+        Store the content for a URL.
+        """
+        expires_at = self._put_memory(url, content)
+        if self.path:
+            self._put_disk(url, content, expires_at)
+
+    async def aput(self, url: str, content: str):
+        """
+        Store the content for a URL without blocking the event loop on the disk tier.
+        """
+        expires_at = self._put_memory(url, content)
+        if self.path:
+            await asyncio.to_thread(self._put_disk, url, content, expires_at)
+
+    def put_error(self, url: str):
+        """
+        Record a failed download so it is retried after the error TTL.
+        """
+        self.put(url, ERROR_MARKER)
+
+    async def aput_error(self, url: str):
+        """
+        Record a failed download without blocking the event loop on the disk tier.
+        """
+        await self.aput(url, ERROR_MARKER)
+
+    def _store(self, url: str, content: str, expires_at: float):
+        if url in self._entries:
+            self._remove(url)
+        size = len(content)
+        if size > self.max_bytes:
+            return
+        self._entries[url] = (content, expires_at)
+        self._size += size
+        while self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, url: str):
+        content, _ = self._entries.pop(url)
+        self._size -= len(content)
+
+    def _prune_disk(self, conn: sqlite3.Connection) -> int:
+        conn.execute("DELETE FROM resources WHERE expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM resources").fetchone()[0]
+        evicted = 0
+        if total <= self.max_disk_bytes:
+            return evicted
+        rows = conn.execute("SELECT key, size FROM resources ORDER BY expires_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            conn.execute("DELETE FROM resources WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        return evicted
+
+    def info(self) -> dict:
+        """
+        Return cache counters and current size.
+        """
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "bytes": self._size}
+
+resource_cache = ResourceCache(
+    max_bytes=int(os.getenv("RESOURCE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.getenv("RESOURCE_CACHE_TTL", str(24 * 3600))),
+    error_ttl=float(os.getenv("RESOURCE_CACHE_ERROR_TTL", "300")),
+    path=os.getenv("RESOURCE_CACHE_PATH") or None,
+    max_disk_bytes=int(os.getenv("RESOURCE_CACHE_MAX_DISK_BYTES", str(512 * 1024 * 1024))),
+    prune_interval=float(os.getenv("RESOURCE_CACHE_PRUNE_INTERVAL", "60"))
+)
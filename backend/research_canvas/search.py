@@ -3,17 +3,18 @@
 The search node is responsible for searching the internet for information.
 """
 
+import asyncio
 import os
 from typing import cast, List
 from pydantic import BaseModel, Field
 from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import AIMessage, ToolMessage, SystemMessage
 from langchain.tools import tool
-from tavily import TavilyClient
+from tavily import AsyncTavilyClient
 from copilotkit.langchain import copilotkit_emit_state, copilotkit_customize_config
 from research_canvas.state import AgentState
 from research_canvas.model import get_model
-import requests
+from research_canvas.search_cache import aget_cached_search, acache_search
 
 class ResourceInput(BaseModel):
     """A resource with a short description"""
@@ -25,7 +26,32 @@ class ResourceInput(BaseModel):
 def ExtractResources(resources: List[ResourceInput]): # pylint: disable=invalid-name,unused-argument
     """Extract the 3-5 most relevant resources from a search result."""
 
-tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+tavily_client = AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+
+# Timeout for a single query and deadline for the whole fan-out, in seconds
+SEARCH_QUERY_TIMEOUT = float(os.getenv("SEARCH_QUERY_TIMEOUT", "15"))
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "30"))
+
+async def _search(i: int, query: str, bypass_cache: bool = False):
+    """
+    Run one search, returning its index with either a response or an error message.
+    """
+    if not bypass_cache:
+        response = await aget_cached_search(query)
+        if response is not None:
+            print(f"Search cache hit for query: {query}")
+            return i, response, None
+    try:
+        print(f"Executing search with query: {query}")
+        response = await asyncio.wait_for(tavily_client.search(query), SEARCH_QUERY_TIMEOUT)
+        await acache_search(query, response)
+        return i, response, None
+    except asyncio.TimeoutError:
+        print(f"Search for query '{query}' timed out after {SEARCH_QUERY_TIMEOUT}s")
+        return i, None, f"Search timed out after {SEARCH_QUERY_TIMEOUT:.0f}s"
+    except Exception as e: # pylint: disable=broad-except
+        print(f"An unexpected error occurred during search for query '{query}': {e}")
+        return i, None, f"Unexpected error: {str(e)}"
 
 async def search_node(state: AgentState, config: RunnableConfig):
     """
@@ -36,6 +62,9 @@ async def search_node(state: AgentState, config: RunnableConfig):
     state["resources"] = state.get("resources", [])
     state["logs"] = state.get("logs", [])
     queries = ai_message.tool_calls[0]["args"]["queries"]
+    bypass_cache = ai_message.tool_calls[0]["args"].get("bypass_cache", False)
+
+    logs_offset = len(state["logs"])
 
     for query in queries:
         state["logs"].append({
@@ -47,24 +76,35 @@ async def search_node(state: AgentState, config: RunnableConfig):
 
     search_results = []
 
-    for i, query in enumerate(queries):
-        try:
-            print(f"Executing search with query: {query}")
-            response = tavily_client.search(query)
+    # Run all queries concurrently and update the UI as each one completes
+    tasks = [asyncio.ensure_future(_search(i, query, bypass_cache)) for i, query in enumerate(queries)]
+    consumed = set()
+
+    def _record(i, response, error):
+        consumed.add(i)
+        if error is None:
             search_results.append(response)
-            state["logs"][i]["done"] = True
-            await copilotkit_emit_state(config, state)
-        except requests.exceptions.HTTPError as e:
-            error_details = e.response.json() if e.response.content else "No additional error details"
-            print(f"HTTPError during search for query '{query}': {e} - {error_details}")
-            state["logs"][i]["message"] = f"Error during search: {error_details}"
-            state["logs"][i]["done"] = True
-            await copilotkit_emit_state(config, state)
-        except Exception as e:
-            print(f"An unexpected error occurred during search for query '{query}': {e}")
-            state["logs"][i]["message"] = f"Unexpected error: {str(e)}"
-            state["logs"][i]["done"] = True
+        else:
+            state["logs"][logs_offset + i]["message"] = error
+        state["logs"][logs_offset + i]["done"] = True
+
+    try:
+        for finished in asyncio.as_completed(tasks, timeout=SEARCH_DEADLINE):
+            _record(*await finished)
             await copilotkit_emit_state(config, state)
+    except asyncio.TimeoutError:
+        print(f"Search deadline of {SEARCH_DEADLINE}s exceeded, cancelling remaining queries")
+        for i, task in enumerate(tasks):
+            if i in consumed:
+                continue
+            # Queries that finished at the deadline but were not yet consumed still count
+            if task.done() and not task.cancelled() and task.exception() is None:
+                _record(*task.result())
+                continue
+            task.cancel()
+            state["logs"][logs_offset + i]["message"] = f"Search cancelled after {SEARCH_DEADLINE:.0f}s deadline"
+            state["logs"][logs_offset + i]["done"] = True
+        await copilotkit_emit_state(config, state)
 
     config = copilotkit_customize_config(
         config,
@@ -0,0 +1,105 @@
+#search_cache.py
+"""
+This module caches web search responses keyed on the normalized query.
+
+Responses are held in memory with a TTL and, when SEARCH_CACHE_DIR is set,
+also written to disk as one JSON file per query so they survive restarts.
+Async callers use aget_cached_search/acache_search, which only leave the event
+loop for the disk tier.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional, Tuple
+from research_canvas.ttl_cache import TTLCache
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(12 * 3600)))
+SEARCH_CACHE_DIR = os.getenv("SEARCH_CACHE_DIR") or None
+SEARCH_CACHE_DISABLED = os.getenv("SEARCH_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+_cache = TTLCache(maxsize=1024, ttl=SEARCH_CACHE_TTL)
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query so near-identical queries share a cache entry. Only case and
+    whitespace are collapsed; punctuation can matter, as in "C++" and "C#".
+    """
+    return " ".join(query.lower().split())
+
+def _path(key: str) -> str:
+    return os.path.join(SEARCH_CACHE_DIR, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+def _get_memory(query: str) -> Tuple[str, Optional[dict]]:
+    key = normalize_query(query)
+    return key, _cache.get(key)
+
+def _get_disk(key: str) -> Optional[dict]:
+    try:
+        with open(_path(key), "r", encoding="utf-8") as file:
+            entry = json.load(file)
+    except (OSError, ValueError):
+        return None
+    remaining = entry["expires_at"] - time.time()
+    if remaining <= 0:
+        return None
+    _cache.set(key, entry["response"], ttl=remaining)
+    return entry["response"]
+
+def get_cached_search(query: str) -> Optional[dict]:
+    """
+    Get the cached response for a query, or None.
+    """
+    if SEARCH_CACHE_DISABLED:
+        return None
+    key, response = _get_memory(query)
+    if response is not None or not SEARCH_CACHE_DIR:
+        return response
+    return _get_disk(key)
+
+async def aget_cached_search(query: str) -> Optional[dict]:
+    """
+    Get the cached response for a query without blocking the event loop on the disk tier.
+    """
+    if SEARCH_CACHE_DISABLED:
+        return None
+    key, response = _get_memory(query)
+    if response is not None or not SEARCH_CACHE_DIR:
+        return response
+    return await asyncio.to_thread(_get_disk, key)
+
+def _put_disk(query: str, key: str, response: dict):
+    try:
+        os.makedirs(SEARCH_CACHE_DIR, exist_ok=True)
+        path = _path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"query": key, "expires_at": time.time() + SEARCH_CACHE_TTL, "response": response}, file)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError) as e:
+        print(f"Could not persist search cache entry for '{query}': {e}")
+
+def cache_search(query: str, response: dict):
+    """
+    Store the response for a query.
+    """
+    if SEARCH_CACHE_DISABLED:
+        return
+    key = normalize_query(query)
+    _cache.set(key, response)
+    if SEARCH_CACHE_DIR:
+        _put_disk(query, key, response)
+
+async def acache_search(query: str, response: dict):
+    """
+    Store the response for a query without blocking the event loop on the disk tier.
+    """
+    if SEARCH_CACHE_DISABLED:
+        return
+    key = normalize_query(query)
+    _cache.set(key, response)
+    if SEARCH_CACHE_DIR:
+        await asyncio.to_thread(_put_disk, query, key, response)
@@ -0,0 +1,205 @@
+#snowflake_pool.py
+"""
+This module provides a bounded, thread-safe pool of Snowflake connections.
+
+Connections are health-checked before reuse when they have been idle for a
+while, closed once they exceed the idle timeout, and always returned to the
+pool through the connection() context manager.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+import snowflake.connector
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available in time."""
+
+class SnowflakeConnectionPool:
+    """
+    A bounded pool of Snowflake connections.
+    """
+
+    def __init__(
+        self,
+        connect_kwargs: dict,
+        max_size: int = 5,
+        idle_timeout: float = 600,
+        health_check_after: float = 60,
+        acquire_timeout: float = 30
+    ):
+        self.connect_kwargs = connect_kwargs
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._metrics = {
+            "created": 0,
+            "reused": 0,
+            "closed": 0,
+            "health_check_failures": 0,
+            "idle_expired": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def _connect(self):
+        conn = snowflake.connector.connect(**self.connect_kwargs)
+        with self._lock:
+            self._metrics["created"] += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception: # pylint: disable=broad-except
+            pass
+        with self._lock:
+            self._metrics["closed"] += 1
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.is_closed():
+            return False
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            return True
+        except Exception: # pylint: disable=broad-except
+            return False
+
+    def acquire(self):
+        """
+        Take a connection from the pool, opening a new one if none are idle.
+        """
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PoolTimeoutError(f"No Snowflake connection available after {self.acquire_timeout}s")
+        with self._lock:
+            self._metrics["wait_seconds"] += time.monotonic() - start
+
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    conn, last_used = self._idle.pop()
+                idle_for = time.monotonic() - last_used
+                if idle_for > self.idle_timeout:
+                    with self._lock:
+                        self._metrics["idle_expired"] += 1
+                    self._close(conn)
+                    continue
+                if idle_for > self.health_check_after and not self._is_healthy(conn):
+                    with self._lock:
+                        self._metrics["health_check_failures"] += 1
+                    self._close(conn)
+                    continue
+                with self._lock:
+                    self._metrics["reused"] += 1
+                    self._in_use += 1
+                return conn
+
+            conn = self._connect()
+            with self._lock:
+                self._in_use += 1
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard: bool = False):
+        """
+        Return a connection to the pool, or close it if discard is set.
+        """
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if discard or conn.is_closed():
+                self._close(conn)
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[snowflake.connector.SnowflakeConnection]:
+        """
+        Borrow a connection for the duration of a with block.
+        The connection is discarded if the block raises a connector error.
+        """
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except snowflake.connector.errors.Error:
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def close_all(self):
+        """
+        Close every idle connection.
+        """
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def metrics(self) -> dict:
+        """
+        Return pool counters and current usage.
+        """
+        with self._lock:
+            return {**self._metrics, "in_use": self._in_use, "idle": len(self._idle), "max_size": self.max_size}
+
+_pools: Dict[Tuple, SnowflakeConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(**overrides) -> SnowflakeConnectionPool:
+    """
+    Get the shared pool for the environment's Snowflake settings.
+    Keyword arguments override individual connection parameters; pass None to omit one.
+    """
+    connect_kwargs = {
+        "user": os.getenv("SNOWFLAKE_USER"),
+        "password": os.getenv("SNOWFLAKE_PASSWORD"),
+        "account": os.getenv("SNOWFLAKE_ACCOUNT"),
+        "warehouse": os.getenv("SNOWFLAKE_WAREHOUSE", "WH_PUBLICATIONS_ETL"),
+        "database": os.getenv("SNOWFLAKE_DATABASE", "RESEARCH_PUBLICATIONS"),
+        "schema": os.getenv("SNOWFLAKE_SCHEMA", "RESEARCH_PUBLICATIONS"),
+        "role": os.getenv("SNOWFLAKE_ROLE"),
+        **overrides
+    }
+    connect_kwargs = {name: value for name, value in connect_kwargs.items() if value is not None}
+    key = tuple(sorted(connect_kwargs.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SnowflakeConnectionPool(
+                connect_kwargs,
+                max_size=int(os.getenv("SNOWFLAKE_POOL_SIZE", "5")),
+                idle_timeout=float(os.getenv("SNOWFLAKE_POOL_IDLE_TIMEOUT", "600"))
+            )
+            _pools[key] = pool
+        return pool
+
+def close_all_pools():
+    """
+    Close idle connections in every shared pool.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()